@@ -3,22 +3,52 @@
 from aiotsmart.exceptions import (
     TSmartBadResponseError,
     TSmartCancelledError,
+    TSmartChecksumError,
     TSmartError,
     TSmartTimeoutError,
 )
-from aiotsmart.discovery import TSmartDiscovery
-from aiotsmart.models import Configuration, DiscoveredDevice, Mode, Status
+from aiotsmart.capture import CaptureReader, CaptureWriter, replay
+from aiotsmart.discovery import DiscoveryService, TSmartDiscovery
+from aiotsmart.fleet import TSmartFleet
+from aiotsmart.history import HistoryStore, StatusHistory
+from aiotsmart.metrics import TSmartMetrics
+from aiotsmart.models import (
+    CompactConfiguration,
+    CompactStatus,
+    Configuration,
+    DiscoveredDevice,
+    Mode,
+    SeenDevice,
+    Status,
+)
+from aiotsmart.registry import SHARED_REGISTRY, DeviceRegistry
+from aiotsmart.tracing import TSmartTracer
 from aiotsmart.tsmart import TSmartClient
 
 __all__ = [
+    "CaptureReader",
+    "CaptureWriter",
+    "replay",
+    "DeviceRegistry",
+    "DiscoveryService",
     "TSmartDiscovery",
+    "TSmartFleet",
+    "CompactConfiguration",
+    "CompactStatus",
     "Configuration",
     "DiscoveredDevice",
     "Status",
     "Mode",
+    "SHARED_REGISTRY",
+    "SeenDevice",
+    "HistoryStore",
+    "StatusHistory",
     "TSmartClient",
+    "TSmartMetrics",
+    "TSmartTracer",
     "TSmartBadResponseError",
     "TSmartCancelledError",
+    "TSmartChecksumError",
     "TSmartError",
     "TSmartTimeoutError",
 ]
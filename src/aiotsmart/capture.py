@@ -0,0 +1,250 @@
+"""Binary capture and replay of TSmart traffic.
+
+A capture file starts with CAPTURE_MAGIC followed by back to back records,
+each a fixed RECORD_STRUCT header (timestamp, direction, IPv4 address, port
+and length) and the raw datagram. Records are only ever appended, and the
+file is read through mmap so large captures are scanned without loading
+them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterator
+import mmap
+import os
+import socket
+import struct
+import time
+from typing import Any, NamedTuple, Self
+
+from aiotsmart.codec import (
+    COMMAND_CONFIGURATION,
+    COMMAND_CONTROL_READ,
+    COMMAND_CONTROL_WRITE,
+)
+from aiotsmart.discovery import DiscoveryProtocol
+from aiotsmart.tsmart import (
+    TsmartProtocol,
+    _unpack_configuration_response,
+    _unpack_control_read_response,
+    _unpack_control_write_response,
+)
+
+CAPTURE_MAGIC = b"TSMCAP\x00\x01"
+RECORD_STRUCT = struct.Struct("=dB4sHH")
+CAPTURE_BUFFER_SIZE = 65536  # bytes
+
+INBOUND = 0
+OUTBOUND = 1
+RETRANSMIT = 2
+
+_UNPACK_FUNCTIONS = {
+    COMMAND_CONFIGURATION: _unpack_configuration_response,
+    COMMAND_CONTROL_READ: _unpack_control_read_response,
+    COMMAND_CONTROL_WRITE: _unpack_control_write_response,
+}
+
+
+class CaptureRecord(NamedTuple):
+    """Datagram read from a capture file."""
+
+    timestamp: float
+    direction: int
+    addr: tuple[str, int]
+    data: bytes
+
+
+class CaptureWriter:
+    """Append datagrams to a capture file.
+
+    Records are packed into an in-memory buffer and written out once it
+    holds buffer_size bytes, on flush and on close, so recording costs a
+    struct pack and a buffer append on the hot path.
+    """
+
+    def __init__(
+        self, path: str | os.PathLike[str], buffer_size: int = CAPTURE_BUFFER_SIZE
+    ) -> None:
+        """Open the capture file for appending."""
+        self.buffer_size = buffer_size
+        self._buffer = bytearray()
+        self._file = open(path, "ab")  # noqa: SIM115 pylint:disable=consider-using-with
+        if self._file.tell() == 0:
+            self._buffer += CAPTURE_MAGIC
+
+    def sent(self, data: bytes, addr: tuple[str | Any, int]) -> None:
+        """Record a datagram sent to a peer."""
+        self._record(OUTBOUND, data, addr)
+
+    def retransmitted(self, data: bytes, addr: tuple[str | Any, int]) -> None:
+        """Record a request sent again to a peer."""
+        self._record(RETRANSMIT, data, addr)
+
+    def received(self, data: bytes, addr: tuple[str | Any, int]) -> None:
+        """Record a datagram received from a peer."""
+        self._record(INBOUND, data, addr)
+
+    def _record(self, direction: int, data: bytes, addr: tuple[str | Any, int]) -> None:
+        """Append a record to the buffer."""
+        buffer = self._buffer
+        buffer += RECORD_STRUCT.pack(
+            time.time(), direction, socket.inet_aton(addr[0]), addr[1], len(data)
+        )
+        buffer += data
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records to the file."""
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+        self._file.flush()
+
+    def close(self) -> None:
+        """Flush and close the capture file."""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> Self:
+        """Enter.
+
+        Returns
+        -------
+            The CaptureWriter object.
+        """
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        """Exit.
+
+        Args:
+        ----
+            _exc_info: Exec type.
+        """
+        self.close()
+
+
+class CaptureReader:
+    """Read the records of a capture file through a memory map."""
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        """Map the capture file."""
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            self._map = (
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+            )
+
+        if self._map is not None and self._map[: len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a TSmart capture")
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        """Return the records in the order they were captured.
+
+        A record cut short by an interrupted write ends the iteration.
+        """
+        buffer = self._map
+        if buffer is None:
+            return
+
+        unpack_from = RECORD_STRUCT.unpack_from
+        header_size = RECORD_STRUCT.size
+        offset = len(CAPTURE_MAGIC)
+        end = len(buffer)
+        while offset + header_size <= end:
+            timestamp, direction, address, port, length = unpack_from(buffer, offset)
+            offset += header_size
+            if offset + length > end:
+                return
+            yield CaptureRecord(
+                timestamp,
+                direction,
+                (socket.inet_ntoa(address), port),
+                buffer[offset : offset + length],
+            )
+            offset += length
+
+    def close(self) -> None:
+        """Unmap the capture file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __enter__(self) -> Self:
+        """Enter.
+
+        Returns
+        -------
+            The CaptureReader object.
+        """
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        """Exit.
+
+        Args:
+        ----
+            _exc_info: Exec type.
+        """
+        self.close()
+
+
+async def replay(
+    path: str | os.PathLike[str],
+    protocol: TsmartProtocol | DiscoveryProtocol,
+    realtime: bool = False,
+) -> int:
+    """Feed the datagrams received in a capture to a protocol.
+
+    With a TsmartProtocol, every captured request is registered as pending
+    first so the responses are matched and decoded as they were live;
+    retransmissions are skipped as they were not registered live either. With
+    realtime, datagrams are delivered at their original pace, otherwise as
+    fast as possible. Returns the number of datagrams delivered.
+    """
+    loop = asyncio.get_running_loop()
+    futures: list[tuple[tuple[str, int], int, asyncio.Future[Any]]] = []
+    delivered = 0
+    start: float | None = None
+    started = loop.time()
+
+    try:
+        with CaptureReader(path) as reader:
+            for record in reader:
+                if realtime:
+                    if start is None:
+                        start = record.timestamp
+                    delay = record.timestamp - start - (loop.time() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                if record.direction == INBOUND:
+                    protocol.datagram_received(record.data, record.addr)
+                    delivered += 1
+                elif (
+                    record.direction == OUTBOUND
+                    and isinstance(protocol, TsmartProtocol)
+                    and record.data
+                ):
+                    unpack_function = _UNPACK_FUNCTIONS.get(record.data[0])
+                    if unpack_function is not None:
+                        command = record.data[0]
+                        future = protocol.expect(
+                            record.addr, record.data, unpack_function
+                        )
+                        futures.append((record.addr, command, future))
+    finally:
+        for addr, command, future in futures:
+            if future.done():
+                if not future.cancelled():
+                    future.exception()
+            else:
+                assert isinstance(protocol, TsmartProtocol)
+                protocol.discard(addr, command, future)
+                future.cancel()
+
+    return delivered
@@ -0,0 +1,489 @@
+"""Wire format of the TSmart protocol.
+
+Structs are compiled once and the fixed requests are built once at import.
+Responses are decoded with unpack_from, which reads bytes, bytearray and
+memoryview buffers in place without copying them.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Collection, Sequence
+import struct
+from typing import Any, NamedTuple
+
+from aiotsmart.util import (
+    add_checksum,
+    add_checksum_into,
+    import_numpy,
+    validate_checksum,
+    validate_checksums_numpy,
+)
+
+from .const import MESSAGE_HEADER
+
+REQUEST_STRUCT = struct.Struct(MESSAGE_HEADER)
+CONTROL_WRITE_STRUCT = struct.Struct("=BBBBHBB")
+
+# cmd, sub, sub2, device_type, device_id, name, tz, checksum
+DISCOVERY_RESPONSE_STRUCT = struct.Struct("=BBBHL32sBB")
+
+# cmd, sub, sub2, device_type, device_id, device_name, tz, userbin,
+# firmware major, minor, deployment, firmware_name, legacy, wifi_ssid,
+# wifi_password, unused
+CONFIGURATION_RESPONSE_STRUCT = struct.Struct("=BBBHL32sBBBBB32s28s32s64s124s")
+
+# cmd, sub, sub2, power, setpoint, mode, t_high, relay, smart_state, t_low,
+# then the first byte of each of the 8 error words (E01, E02, E03, E04, W01,
+# W02, W03, E05) and the checksum
+CONTROL_READ_RESPONSE_STRUCT = struct.Struct("=BBBBHBHBBH" + "Bx" * 8 + "B")
+
+# power, setpoint and mode of a control read response, from byte 3
+CONTROL_READ_SETTINGS_STRUCT = struct.Struct("=BHB")
+CONTROL_READ_SETTINGS_OFFSET = 3
+
+WIFI_OFFSET = 106
+WIFI_SIZE = 96  # wifi_ssid and wifi_password
+
+COMMAND_DISCOVERY = 0x01
+COMMAND_CONFIGURATION = 0x21
+COMMAND_CONTROL_READ = 0xF1
+COMMAND_CONTROL_WRITE = 0xF2
+
+
+def _request(command: int) -> bytes:
+    """Return a checksummed request frame without a payload."""
+    return bytes(add_checksum(REQUEST_STRUCT.pack(command, 0, 0, 0)))
+
+
+DISCOVERY_REQUEST = _request(COMMAND_DISCOVERY)
+CONFIGURATION_REQUEST = _request(COMMAND_CONFIGURATION)
+CONTROL_READ_REQUEST = _request(COMMAND_CONTROL_READ)
+CONTROL_WRITE_RESPONSE = b"\xf2\x00\x00\xa7"
+
+# Error word of each error flag in a control read response
+CONTROL_READ_ERRORS = (
+    ("error_e01", 0),
+    ("error_e02", 1),
+    ("error_e03", 2),
+    ("error_e04", 3),
+    ("error_w01", 4),
+    ("error_w02", 5),
+    ("error_w03", 6),
+    ("error_e05", 7),
+)
+
+
+def pack_control_write(power: bool, mode: int, setpoint: int) -> bytes:
+    """Return a checksummed control write request."""
+    request = bytearray(CONTROL_WRITE_STRUCT.size)
+    CONTROL_WRITE_STRUCT.pack_into(
+        request,
+        0,
+        COMMAND_CONTROL_WRITE,
+        0,
+        0,
+        1 if power else 0,
+        setpoint * 10,
+        mode,
+        0,
+    )
+    add_checksum_into(request)
+    return bytes(request)
+
+
+def pack_discovery_response(device_id: int, device_name: str) -> bytes:
+    """Return a checksummed discovery response, as sent by a heater."""
+    return bytes(
+        add_checksum(
+            DISCOVERY_RESPONSE_STRUCT.pack(
+                COMMAND_DISCOVERY, 0, 0, 0, device_id, device_name.encode(), 0, 0
+            )
+        )
+    )
+
+
+def pack_configuration_response(
+    device_id: int,
+    device_name: str,
+    firmware_version: tuple[int, int, int],
+    firmware_name: str,
+) -> bytes:
+    """Return a checksummed configuration response, as sent by a heater."""
+    return bytes(
+        add_checksum(
+            CONFIGURATION_RESPONSE_STRUCT.pack(
+                COMMAND_CONFIGURATION,
+                0,
+                0,
+                0,
+                device_id,
+                device_name.encode(),
+                0,
+                0,
+                *firmware_version,
+                firmware_name.encode(),
+                b"",
+                b"",
+                b"",
+                b"",
+            )
+        )
+    )
+
+
+def pack_control_read_response(
+    power: bool,
+    *,
+    setpoint: int,
+    mode: int,
+    temperature_high: int,
+    temperature_low: int,
+    relay: bool,
+    errors: Collection[str] = (),
+) -> bytes:
+    """Return a checksummed control read response, as sent by a heater.
+
+    Temperatures are in whole degrees and errors holds the names of the
+    error flags set, such as error_e01.
+    """
+    flags = [0] * len(CONTROL_READ_ERRORS)
+    for name, word in CONTROL_READ_ERRORS:
+        if name in errors:
+            flags[word] = 0x80
+    return bytes(
+        add_checksum(
+            CONTROL_READ_RESPONSE_STRUCT.pack(
+                COMMAND_CONTROL_READ,
+                0,
+                0,
+                1 if power else 0,
+                setpoint * 10,
+                mode,
+                temperature_high * 10,
+                1 if relay else 0,
+                0,
+                temperature_low * 10,
+                *flags,
+                0,
+            )
+        )
+    )
+
+
+def patch_control_read(data: bytes, power: bool, mode: int, setpoint: int) -> bytes:
+    """Return a control read response with new settings.
+
+    The checksum is recomputed so the frame stays valid.
+    """
+    frame = bytearray(data)
+    CONTROL_READ_SETTINGS_STRUCT.pack_into(
+        frame, CONTROL_READ_SETTINGS_OFFSET, 1 if power else 0, setpoint * 10, mode
+    )
+    add_checksum_into(frame)
+    return bytes(frame)
+
+
+def decode_string(value: bytes) -> str:
+    """Decode a NUL padded string field."""
+    return value.split(b"\x00", 1)[0].decode("utf-8")
+
+
+class ControlRead(NamedTuple):
+    """Decoded control read response, in Status field order."""
+
+    power: bool
+    setpoint: int
+    mode: int
+    temperature_high: int
+    temperature_low: int
+    temperature_average: int
+    relay: bool
+    error_e01: bool
+    error_e02: bool
+    error_e03: bool
+    error_e04: bool
+    error_e05: bool
+    error_w01: bool
+    error_w02: bool
+    error_w03: bool
+
+
+class ConfigurationRead(NamedTuple):
+    """Decoded configuration response, in Configuration field order."""
+
+    device_id: str
+    device_name: str
+    firmware_version: str
+    firmware_name: str
+
+
+# pylint:disable=too-many-locals
+def decode_control_read(data: bytes) -> ControlRead:
+    """Decode the fields of a control read response."""
+    # pylint:disable=unused-variable
+    (
+        cmd,
+        sub,
+        sub2,
+        power,
+        setpoint,
+        mode,
+        t_high,
+        relay,
+        smart_state,
+        t_low,
+        e01,
+        e02,
+        e03,
+        e04,
+        w01,
+        w02,
+        w03,
+        e05,
+        checksum,
+    ) = CONTROL_READ_RESPONSE_STRUCT.unpack_from(data)
+
+    return ControlRead(
+        power=bool(power),
+        setpoint=int(setpoint / 10),
+        mode=mode,
+        temperature_high=int(t_high / 10),
+        temperature_low=int(t_low / 10),
+        temperature_average=int((t_high + t_low) / 20),
+        relay=bool(relay),
+        error_e01=e01 >> 7 == 1,
+        error_e02=e02 >> 7 == 1,
+        error_e03=e03 >> 7 == 1,
+        error_e04=e04 >> 7 == 1,
+        error_e05=e05 >> 7 == 1,
+        error_w01=w01 >> 7 == 1,
+        error_w02=w02 >> 7 == 1,
+        error_w03=w03 >> 7 == 1,
+    )
+
+
+# pylint:disable=too-many-locals
+def decode_configuration(data: bytes) -> ConfigurationRead:
+    """Decode the fields of a configuration response."""
+    # pylint:disable=unused-variable
+    (
+        cmd,
+        sub,
+        sub2,
+        device_type,
+        device_id,
+        device_name,
+        tz,
+        userbin,
+        firmware_version_major,
+        firmware_version_minor,
+        firmware_version_deployment,
+        firmware_name,
+        legacy,
+        wifi_ssid,
+        wifi_password,
+        unused,
+    ) = CONFIGURATION_RESPONSE_STRUCT.unpack_from(data)
+
+    return ConfigurationRead(
+        device_id=f"{device_id:04X}",
+        device_name=decode_string(device_name),
+        firmware_version=f"{firmware_version_major}.{firmware_version_minor}.{firmware_version_deployment}",
+        firmware_name=decode_string(firmware_name),
+    )
+
+
+def redact_configuration(data: bytes) -> bytes:
+    """Return a configuration response with the Wi-Fi credentials zeroed.
+
+    The checksum is recomputed so the frame stays valid.
+    """
+    end = WIFI_OFFSET + WIFI_SIZE
+    return bytes(add_checksum(data[:WIFI_OFFSET] + bytes(WIFI_SIZE) + data[end:]))
+
+
+# Column name and array typecode of a pure Python control read batch
+CONTROL_READ_COLUMNS = {
+    "valid": "B",
+    "power": "B",
+    "setpoint": "H",
+    "mode": "B",
+    "temperature_high": "H",
+    "temperature_low": "H",
+    "temperature_average": "H",
+    "relay": "B",
+    **{name: "B" for name, _ in CONTROL_READ_ERRORS},
+}
+
+
+def _join_frames(
+    frames: bytes | Sequence[bytes], size: int
+) -> tuple[bytes, list[bool] | None]:
+    """Return frames as one buffer, with a mask of frames of the right size.
+
+    Frames of the wrong size are replaced by zeros to keep the positions.
+    The mask is None when every frame has the right size.
+    """
+    if isinstance(frames, (bytes, bytearray, memoryview)):
+        if len(frames) % size:
+            raise ValueError(f"Buffer length is not a multiple of {size}")
+        return bytes(frames), None
+
+    blank = bytes(size)
+    sized = [len(frame) == size for frame in frames]
+    if all(sized):
+        return b"".join(frames), None
+    return (
+        b"".join(
+            frame if ok else blank for frame, ok in zip(frames, sized, strict=True)
+        ),
+        sized,
+    )
+
+
+def decode_control_read_batch(
+    frames: bytes | Sequence[bytes], use_numpy: bool | None = None
+) -> Any:
+    """Decode many control read responses into columns.
+
+    Takes one buffer of back to back 30 byte frames or a sequence of frames.
+    Returns a NumPy structured array when NumPy is installed, otherwise a
+    dict of arrays, indexed by column name in both cases. The valid column
+    marks frames with the right length, command and checksum; the other
+    columns of invalid frames are meaningless. Values are scaled as in
+    Status. Set use_numpy to False to force the pure Python decoder.
+    """
+    size = CONTROL_READ_RESPONSE_STRUCT.size
+    buffer, sized = _join_frames(frames, size)
+
+    np = import_numpy() if use_numpy is not False else None
+    if np is None:
+        if use_numpy:
+            raise ImportError("NumPy is not installed")
+        return _decode_control_read_batch_python(buffer, sized)
+
+    raw = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, size)
+    wire = raw.view(
+        np.dtype(
+            [
+                ("cmd", "u1"),
+                ("sub", "u1"),
+                ("sub2", "u1"),
+                ("power", "u1"),
+                ("setpoint", "=u2"),
+                ("mode", "u1"),
+                ("t_high", "=u2"),
+                ("relay", "u1"),
+                ("smart_state", "u1"),
+                ("t_low", "=u2"),
+                ("errors", "u1", (16,)),
+                ("checksum", "u1"),
+            ]
+        )
+    ).reshape(-1)
+
+    result = np.empty(
+        len(wire),
+        dtype=[
+            ("valid", "?"),
+            ("power", "?"),
+            ("setpoint", "u2"),
+            ("mode", "u1"),
+            ("temperature_high", "u2"),
+            ("temperature_low", "u2"),
+            ("temperature_average", "u2"),
+            ("relay", "?"),
+            *((name, "?") for name, _ in CONTROL_READ_ERRORS),
+        ],
+    )
+
+    valid = (wire["cmd"] == COMMAND_CONTROL_READ) & validate_checksums_numpy(raw)
+    if sized is not None:
+        valid &= np.asarray(sized, dtype=bool)
+    result["valid"] = valid
+    result["power"] = wire["power"] != 0
+    result["setpoint"] = wire["setpoint"] // 10
+    result["mode"] = wire["mode"]
+    t_high = wire["t_high"].astype(np.uint32)
+    t_low = wire["t_low"].astype(np.uint32)
+    result["temperature_high"] = t_high // 10
+    result["temperature_low"] = t_low // 10
+    result["temperature_average"] = (t_high + t_low) // 20
+    result["relay"] = wire["relay"] != 0
+    for name, word in CONTROL_READ_ERRORS:
+        result[name] = wire["errors"][:, word * 2] >> 7 == 1
+
+    return result
+
+
+def _decode_control_read_batch_python(
+    buffer: bytes, sized: list[bool] | None
+) -> dict[str, array[int]]:
+    """Decode a control read batch into a dict of arrays."""
+    columns: dict[str, array[int]] = {
+        name: array(typecode) for name, typecode in CONTROL_READ_COLUMNS.items()
+    }
+    size = CONTROL_READ_RESPONSE_STRUCT.size
+
+    for index, offset in enumerate(range(0, len(buffer), size)):
+        frame = buffer[offset : offset + size]
+        columns["valid"].append(
+            (sized is None or sized[index])
+            and frame[0] == COMMAND_CONTROL_READ
+            and validate_checksum(frame)
+        )
+        for name, value in zip(
+            ControlRead._fields, decode_control_read(frame), strict=True
+        ):
+            columns[name].append(value)
+
+    return columns
+
+
+def decode_configuration_batch(
+    frames: bytes | Sequence[bytes], use_numpy: bool | None = None
+) -> dict[str, list[Any]]:
+    """Decode many configuration responses into columns.
+
+    Takes one buffer of back to back frames or a sequence of frames and
+    returns a dict of lists: valid, device_id, device_name,
+    firmware_version and firmware_name. Frames are validated in bulk with
+    NumPy when it is installed; the string fields of invalid frames are
+    None.
+    """
+    size = CONFIGURATION_RESPONSE_STRUCT.size
+    buffer, sized = _join_frames(frames, size)
+    count = len(buffer) // size
+
+    np = import_numpy() if use_numpy is not False else None
+    if np is not None:
+        raw = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, size)
+        mask = (raw[:, 0] == COMMAND_CONFIGURATION) & validate_checksums_numpy(raw)
+        if sized is not None:
+            mask &= np.asarray(sized, dtype=bool)
+        valid = mask.tolist()
+    else:
+        if use_numpy:
+            raise ImportError("NumPy is not installed")
+        valid = [
+            (sized is None or sized[index])
+            and buffer[index * size] == COMMAND_CONFIGURATION
+            and validate_checksum(buffer[index * size : (index + 1) * size])
+            for index in range(count)
+        ]
+
+    columns: dict[str, list[Any]] = {
+        "valid": valid,
+        **{name: [None] * count for name in ConfigurationRead._fields},
+    }
+    for index in range(count):
+        if valid[index]:
+            for name, value in zip(
+                ConfigurationRead._fields,
+                decode_configuration(buffer[index * size : (index + 1) * size]),
+                strict=True,
+            ):
+                columns[name][index] = value
+
+    return columns
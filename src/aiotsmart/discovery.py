@@ -3,31 +3,61 @@
 from __future__ import annotations
 
 import asyncio
+from collections.abc import Iterable
 from dataclasses import dataclass, field
+import ipaddress
+import itertools
 import logging
+import os
 import socket
 import struct
-from typing import Any, Callable, Self
+from typing import TYPE_CHECKING, Any, Callable, Self
 
+from aiotsmart.codec import DISCOVERY_REQUEST, DISCOVERY_RESPONSE_STRUCT, decode_string
+from aiotsmart.exceptions import TSmartError
 from aiotsmart.models import DiscoveredDevice
+from aiotsmart.registry import DeviceRegistry
+from aiotsmart.state import device_discovered
+from aiotsmart.tsmart import (
+    TSmartClient,
+    _acquire_endpoint,
+    _release_endpoint,
+    _SharedEndpoint,
+)
 from aiotsmart.util import validate_checksum
 
-from .const import MESSAGE_HEADER, UDP_PORT
+from .const import UDP_PORT
+
+if TYPE_CHECKING:
+    from aiotsmart.capture import CaptureWriter
+    from aiotsmart.metrics import TSmartMetrics
 
 DISCOVERY_INTERVAL = 2  # seconds
-DISCOVERY_MESSAGE = struct.pack(MESSAGE_HEADER, 0x01, 0, 0, 0x01 ^ 0x55)
+REDISCOVERY_INTERVAL = 60  # seconds
+EXPIRY_BROADCASTS = 3
+SWEEP_RATE = 1000  # probes per second
+SWEEP_BURST_INTERVAL = 0.01  # seconds
+SWEEP_WAIT = 1  # seconds
+VALIDATION_TIMEOUT = 2  # seconds
+
+# Linux interface ioctls and flags, from <linux/sockios.h> and <net/if.h>
+SIOCGIFFLAGS = 0x8913
+SIOCGIFBRDADDR = 0x8919
+IFF_UP = 0x1
+IFF_BROADCAST = 0x2
+IFF_LOOPBACK = 0x8
+IFREQ_STRUCT = struct.Struct("16sH14x")  # name, flags or sockaddr family
+DISCOVERY_MESSAGE = DISCOVERY_REQUEST
 BROADCAST_ADDR = ("255.255.255.255", UDP_PORT)
 
 _LOGGER = logging.getLogger(__name__)
 
-SHARED_LIST: list[DiscoveredDevice] = []
-
 
 def _unpack_discovery_response(
     data: bytes, addr: tuple[str, int]
 ) -> dict[str, str] | None:
     """Return dict of unpacked responses from TSmart Immersion Heater."""
-    response_struct = struct.Struct("=BBBHL32sBB")
+    response_struct = DISCOVERY_RESPONSE_STRUCT
 
     remote_addr_ip_address = addr[0]
 
@@ -39,18 +69,19 @@ def _unpack_discovery_response(
 
     if len(data) != response_struct.size:
         _LOGGER.debug(
-            "Unexpected packet length (got: %d, expected: %d)"
-            % (len(data), response_struct.size)
+            "Unexpected packet length (got: %d, expected: %d)",
+            len(data),
+            response_struct.size,
         )
         return None
 
     if data[0] == 0:
-        _LOGGER.debug("Got error response (code %d)" % (data[0]))
+        _LOGGER.debug("Got error response (code %d)", data[0])
         return None
 
     if data[0] != DISCOVERY_MESSAGE[0]:
         _LOGGER.debug(
-            "Unexpected response type (%02X %02X %02X)" % (data[0], data[1], data[2])
+            "Unexpected response type (%02X %02X %02X)", data[0], data[1], data[2]
         )
         return None
 
@@ -70,22 +101,138 @@ def _unpack_discovery_response(
         name,
         tz,
         checksum,
-    ) = response_struct.unpack(data)
+    ) = response_struct.unpack_from(data)
 
-    result["device_name"] = name.decode("utf-8").split("\x00")[0]
+    result["device_name"] = decode_string(name)
     result["device_id"] = f"{device_id:04X}"
-    _LOGGER.info("Discovered %s %s" % (result["device_id"], result["device_name"]))
+    _LOGGER.info("Discovered %s %s", result["device_id"], result["device_name"])
 
     return result
 
 
+def _notify(
+    callback: Callable[[DiscoveredDevice], Any] | None, device: DiscoveredDevice
+) -> None:
+    """Call a callback with a device, scheduling it if it is a coroutine."""
+    if callable(callback):
+        result = callback(device)
+        if asyncio.iscoroutine(result):
+            asyncio.create_task(result)
+
+
+def _send_probe(
+    transport: asyncio.DatagramTransport,
+    addr: tuple[str, int],
+    capture: CaptureWriter | None,
+    metrics: TSmartMetrics | None,
+) -> None:
+    """Send the discovery message, recording it to capture and metrics."""
+    if capture is not None:
+        capture.sent(DISCOVERY_MESSAGE, addr)
+    if metrics is not None:
+        metrics.discovery_sent()
+    transport.sendto(DISCOVERY_MESSAGE, addr)
+
+
+def _sweep_hosts(
+    networks: Iterable[str | ipaddress.IPv4Network],
+) -> list[str]:
+    """Return the host addresses of the networks, without duplicates."""
+    hosts: dict[str, None] = {}
+    for network in networks:
+        for host in ipaddress.IPv4Network(network, strict=False).hosts():
+            hosts[str(host)] = None
+    return list(hosts)
+
+
+def _local_broadcast_addresses() -> list[str]:
+    """Return the directed broadcast address of each local IPv4 interface.
+
+    Interfaces that are up and broadcast capable are read with Linux
+    ioctls, one address per interface. Elsewhere none are found and
+    discovery falls back to the limited broadcast address.
+    """
+    try:
+        import fcntl  # pylint:disable=import-outside-toplevel
+    except ImportError:
+        return []
+
+    addresses: list[str] = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            names = [name for _, name in socket.if_nameindex()]
+        except OSError:
+            return []
+
+        for name in names:
+            request = IFREQ_STRUCT.pack(name.encode()[:15], 0)
+            try:
+                _, flags = IFREQ_STRUCT.unpack(
+                    fcntl.ioctl(sock.fileno(), SIOCGIFFLAGS, request)
+                )
+                if flags & (IFF_UP | IFF_BROADCAST | IFF_LOOPBACK) != (
+                    IFF_UP | IFF_BROADCAST
+                ):
+                    continue
+                response = fcntl.ioctl(sock.fileno(), SIOCGIFBRDADDR, request)
+            except OSError:
+                # No IPv4 address, or not Linux
+                continue
+            addresses.append(socket.inet_ntoa(response[20:24]))
+
+    return list(dict.fromkeys(addresses))
+
+
+def _broadcast_targets(
+    interfaces: Iterable[str | ipaddress.IPv4Interface] | None,
+) -> list[tuple[str, int]]:
+    """Return the limited broadcast and the directed broadcast of interfaces.
+
+    Interfaces are addresses with their prefix, such as "192.168.1.10/24";
+    None enumerates the local interfaces.
+    """
+    if interfaces is None:
+        broadcasts = _local_broadcast_addresses()
+    else:
+        broadcasts = [
+            str(ipaddress.IPv4Interface(interface).network.broadcast_address)
+            for interface in interfaces
+        ]
+    return list(dict.fromkeys([BROADCAST_ADDR, *((b, UDP_PORT) for b in broadcasts)]))
+
+
+async def _open_listener(protocol: DiscoveryProtocol) -> _SharedEndpoint:
+    """Listen for discovery responses on the endpoint shared with clients.
+
+    A second socket bound to the heater port would take the responses meant
+    for the clients, so discovery adds itself to theirs instead.
+    """
+    endpoint = await _acquire_endpoint(UDP_PORT)
+    protocol.connection_made(endpoint.transport)
+    endpoint.protocol.listeners.append(protocol)
+    return endpoint
+
+
+def _close_listener(endpoint: _SharedEndpoint, protocol: DiscoveryProtocol) -> None:
+    """Stop listening and release the shared endpoint."""
+    endpoint.protocol.listeners.remove(protocol)
+    _release_endpoint(endpoint)
+
+
 class DiscoveryProtocol(asyncio.DatagramProtocol):
     """Protocol to send discovery request and receive responses."""
 
-    def __init__(self, callback: Callable[[DiscoveredDevice], None]) -> None:
-        """Initialize with callback function."""
+    def __init__(
+        self,
+        callback: Callable[[DiscoveredDevice], Any],
+        capture: CaptureWriter | None = None,
+        metrics: TSmartMetrics | None = None,
+    ) -> None:
+        """Initialize with callback function, and optional capture and metrics."""
         self.transport = None
         self.callback = callback
+        self.capture = capture
+        self.metrics = metrics
 
     def connection_made(self, transport: Any) -> None:
         """Connect to transport."""
@@ -94,7 +241,11 @@ class DiscoveryProtocol(asyncio.DatagramProtocol):
     def datagram_received(self, data: bytes, addr: tuple[str | Any, int]) -> None:
         """Test if responder is a TSmart Immersion Heater."""
         _LOGGER.debug("Received discovery response from %s", addr)
+        if self.capture is not None:
+            self.capture.received(data, addr)
         response = _unpack_discovery_response(data, addr)
+        if self.metrics is not None and len(data) != len(DISCOVERY_MESSAGE):
+            self.metrics.discovery_received(bool(response))
         if response:
             if (
                 "ip_address" not in response
@@ -105,70 +256,157 @@ class DiscoveryProtocol(asyncio.DatagramProtocol):
                     "TSmart discovery response %s does not contain enough information to connect",
                     response,
                 )
-            if callable(self.callback):
-                result = self.callback(
-                    DiscoveredDevice(
-                        response["ip_address"],
-                        response["device_id"],
-                        response["device_name"],
-                    )
-                )
-                if asyncio.iscoroutine(result):
-                    asyncio.create_task(result)
+            device = DiscoveredDevice(
+                response["ip_address"],
+                response["device_id"],
+                response["device_name"],
+            )
+            device_discovered(device)
+            _notify(self.callback, device)
 
 
 @dataclass
 class TSmartDiscovery:
-    """TSmart Discovery."""
-
-    _discovered_devices: list[DiscoveredDevice] = field(
-        default_factory=lambda: SHARED_LIST
+    """TSmart Discovery.
+
+    Heaters found are kept in registry, which is per instance unless one
+    is passed in, such as SHARED_REGISTRY to share it between instances.
+
+    Discovery broadcasts to the limited broadcast address, which leaves by
+    a single interface, and to the directed broadcast address of each
+    interface, so every segment of a multi-homed host is covered in one
+    window. Interfaces are the local IPv4 interfaces unless given, as
+    addresses with their prefix such as "192.168.1.10/24". Heaters
+    answering more than once are kept once under their device_id.
+
+    For warm starts, save the registry with registry.save and start with
+    warm_start, which returns the saved heaters at once and checks them in
+    the background.
+
+    With capture, the probes sent and every datagram received while
+    discovering are recorded to the capture file. With metrics, probes
+    and the responses accepted and rejected are counted.
+    """
+
+    registry: DeviceRegistry = field(default_factory=DeviceRegistry)
+    interfaces: list[str | ipaddress.IPv4Interface] | None = None
+    capture: CaptureWriter | None = field(default=None, repr=False, compare=False)
+    metrics: TSmartMetrics | None = field(default=None, repr=False, compare=False)
+
+    validation: asyncio.Task[list[DiscoveredDevice]] | None = field(
+        default=None, init=False, repr=False, compare=False
     )
 
-    def _device_discovered(self, device: DiscoveredDevice) -> None:
-        """Add device to discover list if new."""
-
-        matched_device: DiscoveredDevice | None = next(
-            (x for x in self._discovered_devices if x.ip_address == device.ip_address),
-            None,
-        )
-
-        if not matched_device:
-            self._discovered_devices.append(device)
+    async def _open(self) -> tuple[_SharedEndpoint, DiscoveryProtocol]:
+        """Start listening, adding heaters answering to registry."""
+        protocol = DiscoveryProtocol(self.registry.add, self.capture, self.metrics)
+        return await _open_listener(protocol), protocol
 
     async def discover(self) -> list[DiscoveredDevice]:
         """Broadcast discovery packet and return a list of discovered devices."""
-        loop = asyncio.get_running_loop()
-
-        sock = socket.socket(
-            socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP
-        )  # Internet, UDP
-
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-
-        sock.bind(("", UDP_PORT))
-
-        transport, _ = await loop.create_datagram_endpoint(
-            lambda: DiscoveryProtocol(self._device_discovered),
-            sock=sock,
-        )
+        targets = _broadcast_targets(self.interfaces)
+        endpoint, protocol = await self._open()
 
         try:
             for _ in range(2):
-                _LOGGER.debug("Sending discovery message.")
-                transport.sendto(DISCOVERY_MESSAGE, BROADCAST_ADDR)
+                _LOGGER.debug("Sending discovery message to %s", targets)
+                for target in targets:
+                    _send_probe(endpoint.transport, target, self.capture, self.metrics)
                 await asyncio.sleep(DISCOVERY_INTERVAL)
 
         except asyncio.CancelledError:
             _LOGGER.debug("Cancelling TSmart discovery task")
-            transport.close()
 
         finally:
-            transport.close()
+            _close_listener(endpoint, protocol)
+
+        return self.registry.devices
+
+    def warm_start(self, path: str | os.PathLike[str]) -> list[DiscoveredDevice]:
+        """Return the heaters saved at path, validating them in the background.
+
+        The heaters are added to registry and their saved configurations
+        seeded, so polling can start at once. Each is then sent a
+        configuration request; a heater that does not answer with its
+        device_id is removed, and only then is a full discovery run to find
+        it again. With nothing saved, discovery is run straight away. The
+        validation task returns the heaters once validated.
+        """
+        devices = self.registry.load(path)
+        self.validation = asyncio.create_task(self._validate(devices))
+        return devices
+
+    async def _validate(
+        self, devices: list[DiscoveredDevice]
+    ) -> list[DiscoveredDevice]:
+        """Check heaters loaded from disk, rediscovering if any has gone."""
+        answered = await asyncio.gather(*(self._probe(device) for device in devices))
+
+        failed = [
+            device for device, ok in zip(devices, answered, strict=True) if not ok
+        ]
+        for device in failed:
+            _LOGGER.debug("Saved heater %s did not answer", device.device_id)
+            self.registry.remove(device.device_id)
+
+        if failed or not devices:
+            return await self.discover()
+        return self.registry.devices
+
+    async def _probe(self, device: DiscoveredDevice) -> bool:
+        """Return if a heater answers at its address with its device_id."""
+        client = TSmartClient(device.ip_address, timeout=VALIDATION_TIMEOUT)
+        try:
+            configuration = await client.configuration_read()
+        except TSmartError:
+            return False
+
+        if configuration.device_id != device.device_id:
+            return False
+
+        self.registry.add(
+            DiscoveredDevice(
+                device.ip_address, configuration.device_id, configuration.device_name
+            )
+        )
+        return True
+
+    async def sweep(
+        self,
+        networks: Iterable[str | ipaddress.IPv4Network],
+        rate: float = SWEEP_RATE,
+        wait: float = SWEEP_WAIT,
+    ) -> list[DiscoveredDevice]:
+        """Probe every host of the networks by unicast and return the devices.
+
+        For networks where broadcast is filtered, each host of the CIDR
+        ranges, such as "192.168.4.0/22", is sent the discovery message at
+        no more than rate probes per second. Responses are handled as they
+        arrive while probes are still being sent, and for wait seconds after
+        the last one.
+        """
+        hosts = _sweep_hosts(networks)
+        _LOGGER.debug("Sweeping %d hosts", len(hosts))
+
+        loop = asyncio.get_running_loop()
+        burst = max(1, int(rate * SWEEP_BURST_INTERVAL))
+        endpoint, protocol = await self._open()
+
+        try:
+            start = loop.time()
+            for index, host in enumerate(hosts, 1):
+                _send_probe(
+                    endpoint.transport, (host, UDP_PORT), self.capture, self.metrics
+                )
+                if index % burst == 0:
+                    # Pace bursts against the start so sleep overshoot is not lost
+                    await asyncio.sleep(max(0, start + index / rate - loop.time()))
+            await asyncio.sleep(wait)
+
+        finally:
+            _close_listener(endpoint, protocol)
 
-        return self._discovered_devices
+        return self.registry.devices
 
     async def __aenter__(self) -> Self:
         """Async enter.
@@ -179,6 +417,139 @@ class TSmartDiscovery:
         """
         return self
 
+    async def __aexit__(self, *_exc_info: object) -> None:
+        """Async exit.
+
+        Stops a warm start validation still running.
+
+        Args:
+        ----
+            _exc_info: Exec type.
+        """
+        if self.validation is not None and not self.validation.done():
+            self.validation.cancel()
+            try:
+                await self.validation
+            except asyncio.CancelledError:
+                pass
+
+
+@dataclass
+class DiscoveryService:
+    """Discover TSmart heaters continuously in the background.
+
+    The service listens on the heater port while it runs, sharing the
+    socket of the clients on the loop so they keep getting replies. A
+    broadcast is sent on start, again after DISCOVERY_INTERVAL seconds in
+    case the first was lost, and then every interval seconds. Every heater
+    answering is kept in registry, with when it was first and last seen, so
+    the heaters present are known without waiting.
+
+    On_appeared is called with a heater seen for the first time, and
+    on_disappeared with one that has not answered for expire_after seconds,
+    by default EXPIRY_BROADCASTS intervals. Expiry is checked after each
+    broadcast. Either callback may be a coroutine function.
+
+    Broadcasts cover every interface as TSmartDiscovery does.
+    """
+
+    interval: float = REDISCOVERY_INTERVAL
+    expire_after: float | None = None
+    interfaces: list[str | ipaddress.IPv4Interface] | None = None
+    on_appeared: Callable[[DiscoveredDevice], Any] | None = field(
+        default=None, repr=False, compare=False
+    )
+    on_disappeared: Callable[[DiscoveredDevice], Any] | None = field(
+        default=None, repr=False, compare=False
+    )
+    capture: CaptureWriter | None = field(default=None, repr=False, compare=False)
+    metrics: TSmartMetrics | None = field(default=None, repr=False, compare=False)
+
+    registry: DeviceRegistry = field(default_factory=DeviceRegistry)
+    _endpoint: _SharedEndpoint | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _protocol: DiscoveryProtocol | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _task: asyncio.Task[None] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def devices(self) -> list[DiscoveredDevice]:
+        """Return the heaters currently present."""
+        return self.registry.devices
+
+    def _device_seen(self, device: DiscoveredDevice) -> None:
+        """Record a heater answering discovery."""
+        if self.registry.add(device):
+            _LOGGER.debug(
+                "Heater %s appeared at %s", device.device_id, device.ip_address
+            )
+            _notify(self.on_appeared, device)
+
+    def _expire(self) -> None:
+        """Drop the heaters that have stopped answering."""
+        expire_after = self.expire_after
+        if expire_after is None:
+            expire_after = EXPIRY_BROADCASTS * self.interval
+
+        for seen in self.registry.evict(expire_after):
+            _LOGGER.debug("Heater %s disappeared", seen.device.device_id)
+            _notify(self.on_disappeared, seen.device)
+
+    async def _run(self) -> None:
+        """Broadcast on schedule, expiring heaters after each broadcast."""
+        assert self._endpoint is not None
+        delays = itertools.chain([DISCOVERY_INTERVAL], itertools.repeat(self.interval))
+
+        while True:
+            # Interfaces may come and go while the service runs
+            targets = _broadcast_targets(self.interfaces)
+            _LOGGER.debug("Sending discovery message to %s", targets)
+            for target in targets:
+                _send_probe(
+                    self._endpoint.transport, target, self.capture, self.metrics
+                )
+            await asyncio.sleep(next(delays))
+            self._expire()
+
+    async def start(self) -> None:
+        """Open the listener and start broadcasting."""
+        if self._task is not None:
+            return
+
+        self._protocol = DiscoveryProtocol(
+            self._device_seen, self.capture, self.metrics
+        )
+        self._endpoint = await _open_listener(self._protocol)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop broadcasting and close the listener."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._endpoint is not None and self._protocol is not None:
+            _close_listener(self._endpoint, self._protocol)
+            self._endpoint = None
+            self._protocol = None
+
+    async def __aenter__(self) -> Self:
+        """Async enter.
+
+        Returns
+        -------
+            The DiscoveryService object.
+        """
+        await self.start()
+        return self
+
     async def __aexit__(self, *_exc_info: object) -> None:
         """Async exit.
 
@@ -186,3 +557,4 @@ class TSmartDiscovery:
         ----
             _exc_info: Exec type.
         """
+        await self.close()
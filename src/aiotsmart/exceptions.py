@@ -15,3 +15,7 @@ class TSmartTimeoutError(TSmartError):
 
 class TSmartBadResponseError(TSmartError):
     """TSmart bad response exception."""
+
+
+class TSmartChecksumError(TSmartBadResponseError):
+    """TSmart response checksum exception."""
@@ -0,0 +1,128 @@
+"""TSmart Fleet."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import logging
+from typing import Awaitable, Callable, Self, TypeVar
+
+from aiotsmart.exceptions import TSmartBadResponseError, TSmartTimeoutError
+from aiotsmart.history import HistoryStore
+from aiotsmart.metrics import TSmartMetrics
+from aiotsmart.models import Configuration, DiscoveredDevice, Status
+from aiotsmart.tracing import TSmartTracer
+from aiotsmart.tsmart import RETRIES, TIMEOUT, TSmartClient
+
+from .const import UDP_PORT
+
+CONCURRENCY = 64
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+
+@dataclass
+class TSmartFleet:
+    """Read many TSmart heaters concurrently.
+
+    Results are keyed on device_id. A heater that times out or sends a bad
+    response has the exception as its result rather than failing the sweep.
+    """
+
+    devices: list[DiscoveredDevice]
+    concurrency: int = CONCURRENCY
+    local_port: int = UDP_PORT
+    timeout: float = TIMEOUT
+    retries: int = RETRIES
+    history: HistoryStore | None = None
+    metrics: TSmartMetrics | None = field(default=None, repr=False, compare=False)
+    tracer: TSmartTracer | None = field(default=None, repr=False, compare=False)
+
+    _clients: dict[str, TSmartClient] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _entered: bool = field(default=False, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """Create a client for each device."""
+        self._clients = {
+            device.device_id: TSmartClient(
+                device.ip_address,
+                local_port=self.local_port,
+                timeout=self.timeout,
+                retries=self.retries,
+                history=self.history,
+                metrics=self.metrics,
+                tracer=self.tracer,
+            )
+            for device in self.devices
+        }
+
+    async def _sweep(
+        self, read: Callable[[TSmartClient], Awaitable[_T]]
+    ) -> dict[str, _T | TSmartTimeoutError | TSmartBadResponseError]:
+        """Run a read against every device with bounded concurrency."""
+
+        if not self._entered:
+            async with self:
+                return await self._sweep(read)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(
+            client: TSmartClient,
+        ) -> _T | TSmartTimeoutError | TSmartBadResponseError:
+            async with semaphore:
+                try:
+                    return await read(client)
+                except (TSmartTimeoutError, TSmartBadResponseError) as ex:
+                    _LOGGER.debug("Read from %s failed: %r", client.ip_address, ex)
+                    return ex
+
+        results = await asyncio.gather(
+            *(run(client) for client in self._clients.values())
+        )
+        return dict(zip(self._clients, results, strict=True))
+
+    async def configuration_read(
+        self,
+    ) -> dict[str, Configuration | TSmartTimeoutError | TSmartBadResponseError]:
+        """Get configuration from every immersion heater."""
+        return await self._sweep(TSmartClient.configuration_read)
+
+    async def control_read(
+        self, max_age: float | None = None
+    ) -> dict[str, Status | TSmartTimeoutError | TSmartBadResponseError]:
+        """Get status from every immersion heater.
+
+        With max_age, heaters with a cached status younger than max_age
+        seconds are not polled.
+        """
+        return await self._sweep(lambda client: client.control_read(max_age))
+
+    async def __aenter__(self) -> Self:
+        """Async enter.
+
+        Opens the shared UDP endpoint for every client in the fleet.
+
+        Returns
+        -------
+            The TSmartFleet object.
+        """
+        for client in self._clients.values():
+            await client.__aenter__()
+        self._entered = True
+        return self
+
+    async def __aexit__(self, *_exc_info: object) -> None:
+        """Async exit.
+
+        Args:
+        ----
+            _exc_info: Exec type.
+        """
+        self._entered = False
+        for client in self._clients.values():
+            await client.__aexit__()
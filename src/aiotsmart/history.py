@@ -0,0 +1,165 @@
+"""In-memory status history for TSmart heaters."""
+
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+import time
+from typing import Any
+
+from aiotsmart.models import Status
+
+# Column name and array typecode. A sample takes 12 bytes, so a week of
+# 10 second samples is about 0.7 MB per heater.
+COLUMNS = {
+    "time": "I",  # seconds since the epoch
+    "temperature_high": "h",
+    "temperature_low": "h",
+    "setpoint": "B",
+    "mode": "B",
+    "flags": "B",
+    "errors": "B",
+}
+
+FLAG_POWER = 0x01
+FLAG_RELAY = 0x02
+
+# Bit in the errors column for each error of a Status
+ERROR_BITS = {
+    "error_e01": 0x01,
+    "error_e02": 0x02,
+    "error_e03": 0x04,
+    "error_e04": 0x08,
+    "error_e05": 0x10,
+    "error_w01": 0x20,
+    "error_w02": 0x40,
+    "error_w03": 0x80,
+}
+
+
+class StatusHistory:
+    """Fixed size ring buffer of status samples for one heater.
+
+    Samples are stored in one typed array per column, so appending is O(1)
+    and creates no Python object per sample. Once full, the oldest sample
+    is overwritten. Samples are expected to be appended in time order.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize an empty history holding up to capacity samples."""
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+
+        self.capacity = capacity
+        self.columns = {
+            name: array(typecode, [0]) * capacity for name, typecode in COLUMNS.items()
+        }
+        self._start = 0
+        self._length = 0
+        self._last: Status | None = None
+
+    def __len__(self) -> int:
+        """Return the number of samples held."""
+        return self._length
+
+    def append(self, status: Status, timestamp: float | None = None) -> None:
+        """Append a status sampled at timestamp (default now)."""
+        if status is self._last:
+            # The same read shared by several clients
+            return
+        self._last = status
+
+        if self._length < self.capacity:
+            index = (self._start + self._length) % self.capacity
+            self._length += 1
+        else:
+            index = self._start
+            self._start = (self._start + 1) % self.capacity
+
+        errors = 0
+        for name, bit in ERROR_BITS.items():
+            if getattr(status, name):
+                errors |= bit
+
+        columns = self.columns
+        columns["time"][index] = int(time.time() if timestamp is None else timestamp)
+        columns["temperature_high"][index] = status.temperature_high
+        columns["temperature_low"][index] = status.temperature_low
+        columns["setpoint"][index] = status.setpoint
+        columns["mode"][index] = status.mode
+        columns["flags"][index] = (FLAG_POWER if status.power else 0) | (
+            FLAG_RELAY if status.relay else 0
+        )
+        columns["errors"][index] = errors
+
+    def _bisect(self, timestamp: float) -> int:
+        """Return the position of the first sample at or after timestamp."""
+        times = self.columns["time"]
+        low, high = 0, self._length
+        while low < high:
+            middle = (low + high) // 2
+            if times[(self._start + middle) % self.capacity] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def window(
+        self, start: float | None = None, end: float | None = None
+    ) -> dict[str, array[Any]]:
+        """Return the samples with start <= time < end, oldest first.
+
+        Each column is returned as a new array.
+        """
+        first = 0 if start is None else self._bisect(start)
+        last = self._length if end is None else self._bisect(end)
+        if last <= first:
+            return {name: array(typecode) for name, typecode in COLUMNS.items()}
+
+        begin = (self._start + first) % self.capacity
+        finish = begin + last - first
+        if finish <= self.capacity:
+            return {name: column[begin:finish] for name, column in self.columns.items()}
+
+        finish -= self.capacity
+        return {
+            name: column[begin:] + column[:finish]
+            for name, column in self.columns.items()
+        }
+
+    def window_numpy(
+        self, start: float | None = None, end: float | None = None
+    ) -> dict[str, Any]:
+        """Return the samples with start <= time < end as NumPy arrays.
+
+        Raises ImportError if NumPy is not installed.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+        return {
+            name: np.frombuffer(column, dtype=column.typecode)
+            for name, column in self.window(start, end).items()
+        }
+
+
+@dataclass
+class HistoryStore:
+    """Status histories of many heaters, each holding capacity samples."""
+
+    capacity: int
+    histories: dict[str, StatusHistory] = field(default_factory=dict)
+
+    def __getitem__(self, key: str) -> StatusHistory:
+        """Return the history for a heater."""
+        return self.histories[key]
+
+    def __contains__(self, key: object) -> bool:
+        """Return if there is a history for a heater."""
+        return key in self.histories
+
+    def record(self, key: str, status: Status, timestamp: float | None = None) -> None:
+        """Append a status to the history of a heater."""
+        history = self.histories.get(key)
+        if history is None:
+            history = self.histories[key] = StatusHistory(self.capacity)
+        history.append(status, timestamp)
@@ -0,0 +1,194 @@
+"""Request metrics for TSmart clients and discovery."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiotsmart.codec import (
+    COMMAND_CONFIGURATION,
+    COMMAND_CONTROL_READ,
+    COMMAND_CONTROL_WRITE,
+    COMMAND_DISCOVERY,
+)
+from aiotsmart.exceptions import (
+    TSmartBadResponseError,
+    TSmartChecksumError,
+    TSmartTimeoutError,
+)
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+COMMAND_NAMES = {
+    COMMAND_DISCOVERY: "discovery",
+    COMMAND_CONFIGURATION: "configuration",
+    COMMAND_CONTROL_READ: "control_read",
+    COMMAND_CONTROL_WRITE: "control_write",
+}
+
+
+@dataclass
+class LatencyHistogram:
+    """Histogram of request latencies.
+
+    Counts holds one count per bucket of LATENCY_BUCKETS, plus one for
+    latencies above the last bucket.
+    """
+
+    counts: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    count: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+
+    def observe(self, latency: float) -> None:
+        """Add a latency in seconds."""
+        self.counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.maximum = max(self.maximum, latency)
+
+    @property
+    def mean(self) -> float | None:
+        """Return the mean latency, or None before any request."""
+        return self.total / self.count if self.count else None
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the histogram as plain data."""
+        return {
+            "buckets": {
+                **{
+                    str(bound): count
+                    for bound, count in zip(LATENCY_BUCKETS, self.counts, strict=False)
+                },
+                "+Inf": self.counts[-1],
+            },
+            "count": self.count,
+            "mean": self.mean,
+            "max": self.maximum,
+        }
+
+
+@dataclass
+class DeviceMetrics:
+    """Request counters of one heater.
+
+    Attempts counts the requests by the number of times each was sent.
+    """
+
+    requests: int = 0
+    attempts: Counter[int] = field(default_factory=Counter)
+    retransmits: int = 0
+    timeouts: int = 0
+    bad_responses: int = 0
+    checksum_failures: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the counters as plain data."""
+        return {
+            "requests": self.requests,
+            "attempts": {
+                str(attempts): count
+                for attempts, count in sorted(self.attempts.items())
+            },
+            "retransmits": self.retransmits,
+            "timeouts": self.timeouts,
+            "bad_responses": self.bad_responses,
+            "checksum_failures": self.checksum_failures,
+            "latency": self.latency.snapshot(),
+        }
+
+
+@dataclass
+class TSmartMetrics:
+    """Metrics of the requests made by clients and discovery sharing it.
+
+    Updating the metrics costs a few counter increments per request, so
+    they can be left on. Bad responses include checksum failures, which
+    are also counted on their own. Devices are keyed on IP address, with
+    the port added when it is not the heater port.
+    """
+
+    requests: Counter[int] = field(default_factory=Counter)
+    in_flight: int = 0
+    in_flight_peak: int = 0
+    devices: dict[str, DeviceMetrics] = field(default_factory=dict)
+    discovery_responses: int = 0
+    discovery_rejected: int = 0
+
+    def device(self, device: str) -> DeviceMetrics:
+        """Return the metrics of a heater."""
+        metrics = self.devices.get(device)
+        if metrics is None:
+            metrics = self.devices[device] = DeviceMetrics()
+        return metrics
+
+    def request_started(self, device: str, command: int) -> None:
+        """Count a request sent to a heater."""
+        self.requests[command] += 1
+        self.device(device).requests += 1
+        self.in_flight += 1
+        self.in_flight_peak = max(self.in_flight_peak, self.in_flight)
+
+    def request_finished(
+        self,
+        device: str,
+        attempts: int,
+        latency: float | None = None,
+        error: BaseException | None = None,
+    ) -> None:
+        """Count the outcome of a request to a heater.
+
+        The latency is only recorded for a request that was answered.
+        """
+        self.in_flight -= 1
+        metrics = self.device(device)
+        metrics.attempts[attempts] += 1
+        metrics.retransmits += attempts - 1
+
+        if isinstance(error, TSmartTimeoutError):
+            metrics.timeouts += 1
+        elif isinstance(error, TSmartBadResponseError):
+            metrics.bad_responses += 1
+            if isinstance(error, TSmartChecksumError):
+                metrics.checksum_failures += 1
+        elif error is None and latency is not None:
+            metrics.latency.observe(latency)
+
+    def discovery_sent(self) -> None:
+        """Count a discovery broadcast."""
+        self.requests[COMMAND_DISCOVERY] += 1
+
+    def discovery_received(self, accepted: bool) -> None:
+        """Count a datagram received by discovery."""
+        if accepted:
+            self.discovery_responses += 1
+        else:
+            self.discovery_rejected += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the metrics as plain data, such as for JSON."""
+        return {
+            "requests": {
+                COMMAND_NAMES.get(command, f"{command:02X}"): count
+                for command, count in sorted(self.requests.items())
+            },
+            "in_flight": self.in_flight,
+            "in_flight_peak": self.in_flight_peak,
+            "timeouts": sum(device.timeouts for device in self.devices.values()),
+            "bad_responses": sum(
+                device.bad_responses for device in self.devices.values()
+            ),
+            "checksum_failures": sum(
+                device.checksum_failures for device in self.devices.values()
+            ),
+            "discovery_responses": self.discovery_responses,
+            "discovery_rejected": self.discovery_rejected,
+            "devices": {
+                device: metrics.snapshot()
+                for device, metrics in sorted(self.devices.items())
+            },
+        }
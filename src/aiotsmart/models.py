@@ -5,6 +5,14 @@ from __future__ import annotations
 from dataclasses import dataclass
 from enum import IntEnum
 
+from aiotsmart.codec import (
+    ConfigurationRead,
+    ControlRead,
+    decode_configuration,
+    decode_control_read,
+    redact_configuration,
+)
+
 
 class Mode(IntEnum):
     """TSmart Modes."""
@@ -28,6 +36,18 @@ class DiscoveredDevice:
     device_name: str
 
 
+@dataclass
+class SeenDevice:
+    """Device kept by continuous discovery.
+
+    First_seen and last_seen are time.monotonic() timestamps.
+    """
+
+    device: DiscoveredDevice
+    first_seen: float
+    last_seen: float
+
+
 @dataclass
 class Configuration:
     """Configuration model."""
@@ -73,3 +93,209 @@ class Status:
             or self.error_w02
             or self.error_w03
         )
+
+
+class CompactStatus:
+    """Status decoded lazily from a control read response.
+
+    Only the raw frame is kept, without a per-instance __dict__, and the
+    fields are decoded once on first access. Compares equal to a Status
+    with the same values. The frame is not validated, so create it from a
+    Status or a response that has already been checked.
+    """
+
+    __slots__ = ("_fields", "raw_response")
+
+    def __init__(self, raw_response: bytes) -> None:
+        """Initialize from a control read response."""
+        self.raw_response = bytes(raw_response)
+        self._fields: ControlRead | None = None
+
+    @classmethod
+    def from_status(cls, status: Status) -> CompactStatus:
+        """Return a compact copy of a status."""
+        return cls(status.raw_response)
+
+    def _decoded(self) -> ControlRead:
+        """Return the decoded fields, decoding them on first use."""
+        if self._fields is None:
+            self._fields = decode_control_read(self.raw_response)
+        return self._fields
+
+    def to_status(self) -> Status:
+        """Return the equivalent Status."""
+        fields = self._decoded()
+        return Status(
+            fields.power,
+            fields.setpoint,
+            Mode(fields.mode),
+            *fields[3:],
+            raw_response=self.raw_response,
+        )
+
+    @property
+    def power(self) -> bool:
+        """Power."""
+        return self._decoded().power
+
+    @property
+    def setpoint(self) -> int:
+        """Setpoint."""
+        return self._decoded().setpoint
+
+    @property
+    def mode(self) -> Mode:
+        """Mode."""
+        return Mode(self._decoded().mode)
+
+    @property
+    def temperature_high(self) -> int:
+        """Temperature at the top of the tank."""
+        return self._decoded().temperature_high
+
+    @property
+    def temperature_low(self) -> int:
+        """Temperature at the bottom of the tank."""
+        return self._decoded().temperature_low
+
+    @property
+    def temperature_average(self) -> int:
+        """Average temperature."""
+        return self._decoded().temperature_average
+
+    @property
+    def relay(self) -> bool:
+        """Relay."""
+        return self._decoded().relay
+
+    @property
+    def error_e01(self) -> bool:
+        """Error E01."""
+        return self._decoded().error_e01
+
+    @property
+    def error_e02(self) -> bool:
+        """Error E02."""
+        return self._decoded().error_e02
+
+    @property
+    def error_e03(self) -> bool:
+        """Error E03."""
+        return self._decoded().error_e03
+
+    @property
+    def error_e04(self) -> bool:
+        """Error E04."""
+        return self._decoded().error_e04
+
+    @property
+    def error_e05(self) -> bool:
+        """Error E05."""
+        return self._decoded().error_e05
+
+    @property
+    def error_w01(self) -> bool:
+        """Warning W01."""
+        return self._decoded().error_w01
+
+    @property
+    def error_w02(self) -> bool:
+        """Warning W02."""
+        return self._decoded().error_w02
+
+    @property
+    def error_w03(self) -> bool:
+        """Warning W03."""
+        return self._decoded().error_w03
+
+    @property
+    def has_error(self) -> bool:
+        """Is there any error."""
+        return any(self._decoded()[7:])
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with another CompactStatus or a Status."""
+        if isinstance(other, CompactStatus):
+            return self.raw_response == other.raw_response
+        if isinstance(other, Status):
+            return self.to_status() == other
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        """Return the representation of the equivalent Status."""
+        return repr(self.to_status()).replace("Status(", "CompactStatus(", 1)
+
+
+class CompactConfiguration:
+    """Configuration decoded lazily from a configuration response.
+
+    Only the raw frame is kept, without a per-instance __dict__, and the
+    fields are decoded once on first access. Compares equal to a
+    Configuration with the same values. With redact, the Wi-Fi SSID and
+    password are zeroed in the kept frame, so it then only equals
+    configurations with the same redacted frame.
+    """
+
+    __slots__ = ("_fields", "raw_response")
+
+    def __init__(self, raw_response: bytes, redact: bool = False) -> None:
+        """Initialize from a configuration response."""
+        self.raw_response = (
+            redact_configuration(raw_response) if redact else bytes(raw_response)
+        )
+        self._fields: ConfigurationRead | None = None
+
+    @classmethod
+    def from_configuration(
+        cls, configuration: Configuration, redact: bool = False
+    ) -> CompactConfiguration:
+        """Return a compact copy of a configuration."""
+        return cls(configuration.raw_response, redact)
+
+    def _decoded(self) -> ConfigurationRead:
+        """Return the decoded fields, decoding them on first use."""
+        if self._fields is None:
+            self._fields = decode_configuration(self.raw_response)
+        return self._fields
+
+    def to_configuration(self) -> Configuration:
+        """Return the equivalent Configuration."""
+        return Configuration(*self._decoded(), raw_response=self.raw_response)
+
+    @property
+    def device_id(self) -> str:
+        """Device id."""
+        return self._decoded().device_id
+
+    @property
+    def device_name(self) -> str:
+        """Device name."""
+        return self._decoded().device_name
+
+    @property
+    def firmware_version(self) -> str:
+        """Firmware version."""
+        return self._decoded().firmware_version
+
+    @property
+    def firmware_name(self) -> str:
+        """Firmware name."""
+        return self._decoded().firmware_name
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with another CompactConfiguration or a Configuration."""
+        if isinstance(other, CompactConfiguration):
+            return self.raw_response == other.raw_response
+        if isinstance(other, Configuration):
+            return self.to_configuration() == other
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        """Return the representation of the equivalent Configuration."""
+        return repr(self.to_configuration()).replace(
+            "Configuration(", "CompactConfiguration(", 1
+        )
@@ -0,0 +1,254 @@
+"""Registry of discovered TSmart heaters."""
+
+from __future__ import annotations
+
+import base64
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+import json
+import logging
+import os
+import time
+from typing import Any
+
+from aiotsmart.codec import (
+    CONFIGURATION_RESPONSE_STRUCT,
+    decode_configuration,
+    redact_configuration,
+)
+from aiotsmart.models import Configuration, DiscoveredDevice, SeenDevice
+from aiotsmart.state import find_device_state, get_device_state
+from aiotsmart.tsmart import TSmartClient
+from aiotsmart.util import validate_checksum
+
+from .const import UDP_PORT
+
+_LOGGER = logging.getLogger(__name__)
+
+REGISTRY_FILE_VERSION = 1
+
+
+@dataclass
+class DeviceRegistry:
+    """Discovered heaters indexed on device_id and IP address.
+
+    A heater answering from a new address, such as after a DHCP lease
+    change, updates its entry rather than adding another; a heater that
+    answers from an address held by another heater replaces it there. With
+    ttl, heaters not seen for ttl seconds are evicted when the registry is
+    read. Timestamps are time.monotonic() values.
+
+    Each TSmartDiscovery has its own registry unless given one to share.
+
+    The registry can be saved to a compact JSON file and loaded back after
+    a restart. Each heater is saved with when it was last seen and the
+    configuration cached for it, if any, with the Wi-Fi credentials zeroed.
+    """
+
+    ttl: float | None = None
+
+    _by_id: dict[str, SeenDevice] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _by_ip: dict[str, str] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def add(self, device: DiscoveredDevice, now: float | None = None) -> bool:
+        """Record a heater seen, returning if it is new to the registry."""
+        if now is None:
+            now = time.monotonic()
+
+        # Another heater at this address has moved or been replaced
+        previous_id = self._by_ip.get(device.ip_address)
+        if previous_id is not None and previous_id != device.device_id:
+            _LOGGER.debug(
+                "Heater %s replaced %s at %s",
+                device.device_id,
+                previous_id,
+                device.ip_address,
+            )
+            self.remove(previous_id)
+
+        seen = self._by_id.get(device.device_id)
+        if seen is None:
+            self._by_id[device.device_id] = SeenDevice(device, now, now)
+            self._by_ip[device.ip_address] = device.device_id
+            return True
+
+        if seen.device.ip_address != device.ip_address:
+            _LOGGER.debug(
+                "Heater %s moved from %s to %s",
+                device.device_id,
+                seen.device.ip_address,
+                device.ip_address,
+            )
+            del self._by_ip[seen.device.ip_address]
+            self._by_ip[device.ip_address] = device.device_id
+        seen.device = device
+        seen.last_seen = now
+        return False
+
+    def remove(self, device_id: str) -> SeenDevice | None:
+        """Remove a heater, returning its entry if it was registered."""
+        seen = self._by_id.pop(device_id, None)
+        if seen is not None:
+            del self._by_ip[seen.device.ip_address]
+        return seen
+
+    def evict(
+        self, ttl: float | None = None, now: float | None = None
+    ) -> list[SeenDevice]:
+        """Remove and return the heaters not seen for ttl seconds.
+
+        Ttl defaults to that of the registry; without either nothing is
+        evicted.
+        """
+        if ttl is None:
+            ttl = self.ttl
+        if ttl is None:
+            return []
+        if now is None:
+            now = time.monotonic()
+
+        expired = [seen for seen in self._by_id.values() if now - seen.last_seen > ttl]
+        for seen in expired:
+            self.remove(seen.device.device_id)
+        return expired
+
+    def seen(self, device_id: str) -> SeenDevice | None:
+        """Return the entry of a heater, with when it was first and last seen."""
+        self.evict()
+        return self._by_id.get(device_id)
+
+    def get(self, device_id: str) -> DiscoveredDevice | None:
+        """Return a heater by device_id."""
+        seen = self.seen(device_id)
+        return None if seen is None else seen.device
+
+    def get_by_ip(self, ip_address: str) -> DiscoveredDevice | None:
+        """Return the heater at an IP address."""
+        device_id = self._by_ip.get(ip_address)
+        return None if device_id is None else self.get(device_id)
+
+    @property
+    def devices(self) -> list[DiscoveredDevice]:
+        """Return the registered heaters in the order they were first seen."""
+        self.evict()
+        return [seen.device for seen in self._by_id.values()]
+
+    def client(self, device_id: str, **kwargs: Any) -> TSmartClient:
+        """Return a client for a heater, passing kwargs to TSmartClient.
+
+        Raises KeyError if the heater is not registered.
+        """
+        device = self.get(device_id)
+        if device is None:
+            raise KeyError(device_id)
+        return TSmartClient(device.ip_address, **kwargs)
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """Write the registry to a file, replacing it atomically."""
+        offset = time.time() - time.monotonic()
+        entries = []
+        for seen in self._by_id.values():
+            device = seen.device
+            state = find_device_state((device.ip_address, UDP_PORT))
+            configuration = None
+            if state is not None and state.configuration is not None:
+                configuration = base64.b64encode(
+                    redact_configuration(state.configuration.raw_response)
+                ).decode()
+            entries.append(
+                [
+                    device.ip_address,
+                    device.device_id,
+                    device.device_name,
+                    round(seen.last_seen + offset, 3),
+                    configuration,
+                ]
+            )
+
+        temporary = f"{os.fspath(path)}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": REGISTRY_FILE_VERSION, "devices": entries},
+                file,
+                separators=(",", ":"),
+            )
+        os.replace(temporary, path)
+
+    def load(self, path: str | os.PathLike[str]) -> list[DiscoveredDevice]:
+        """Add the heaters saved in a file and return them.
+
+        Saved configurations are seeded into the configuration cache, with
+        their Wi-Fi credentials zeroed, until the heater is read again. They
+        are as old as when their heater was last seen, so a configuration_ttl
+        shorter than that reads the heater again. A missing or unreadable
+        file loads nothing.
+        """
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+            if data["version"] != REGISTRY_FILE_VERSION:
+                raise ValueError(f"Unsupported version {data['version']}")
+            entries = [
+                (
+                    str(ip),
+                    str(device_id),
+                    str(name),
+                    float(last_seen),
+                    None if configuration is None else base64.b64decode(configuration),
+                )
+                for ip, device_id, name, last_seen, configuration in data["devices"]
+            ]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, TypeError, KeyError) as ex:
+            _LOGGER.warning("Ignoring device registry %s: %s", path, ex)
+            return []
+
+        offset = time.time() - time.monotonic()
+        devices = []
+        for ip_address, device_id, device_name, last_seen, configuration in entries:
+            device = DiscoveredDevice(ip_address, device_id, device_name)
+            seen = last_seen - offset
+            self.add(device, now=seen)
+            devices.append(device)
+
+            if (
+                configuration is not None
+                and len(configuration) == CONFIGURATION_RESPONSE_STRUCT.size
+                and validate_checksum(configuration)
+            ):
+                get_device_state((ip_address, UDP_PORT)).set_configuration(
+                    Configuration(
+                        *decode_configuration(configuration),
+                        raw_response=configuration,
+                    ),
+                    now=seen,
+                )
+
+        _LOGGER.debug("Loaded %d heaters from %s", len(devices), path)
+        return devices
+
+    def clear(self) -> None:
+        """Remove every heater."""
+        self._by_id.clear()
+        self._by_ip.clear()
+
+    def __contains__(self, device_id: object) -> bool:
+        """Return if a heater is registered under device_id."""
+        return isinstance(device_id, str) and self.get(device_id) is not None
+
+    def __iter__(self) -> Iterator[DiscoveredDevice]:
+        """Iterate over the registered heaters."""
+        return iter(self.devices)
+
+    def __len__(self) -> int:
+        """Return the number of registered heaters."""
+        self.evict()
+        return len(self._by_id)
+
+
+SHARED_REGISTRY = DeviceRegistry()
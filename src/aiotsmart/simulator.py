@@ -0,0 +1,263 @@
+"""Simulated TSmart heaters for testing without hardware.
+
+Each simulated heater answers discovery, configuration, control read and
+control write requests on its own UDP socket, with state that writes
+change. Heaters either share a host on distinct ephemeral ports, reached
+with TSmartClient(ip_address, port=...), or sit on consecutive loopback
+addresses on the heater port, where discovery and TSmartFleet reach them
+as real heaters.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from functools import partial
+import ipaddress
+import logging
+import socket
+from typing import Any, Self
+
+from aiotsmart.codec import (
+    COMMAND_CONFIGURATION,
+    COMMAND_CONTROL_READ,
+    COMMAND_CONTROL_WRITE,
+    COMMAND_DISCOVERY,
+    CONTROL_WRITE_RESPONSE,
+    CONTROL_WRITE_STRUCT,
+    pack_configuration_response,
+    pack_control_read_response,
+    pack_discovery_response,
+)
+from aiotsmart.models import DiscoveredDevice, Mode
+from aiotsmart.util import validate_checksum
+
+from .const import UDP_PORT
+
+_LOGGER = logging.getLogger(__name__)
+
+BROADCAST_LISTEN_ADDR = ("255.255.255.255", UDP_PORT)
+DEVICE_ID_BASE = 0x100000
+
+
+@dataclass
+class SimulatedHeater:
+    """State of a simulated heater.
+
+    Temperatures are in whole degrees. A silent heater ignores every
+    request, as a heater that is off line. Requests counts the requests
+    the heater has answered.
+    """
+
+    ip_address: str = "127.0.0.1"
+    port: int = 0
+    device_id: int = 0x9B2A0D
+    device_name: str = "TESLA"
+    firmware_version: tuple[int, int, int] = (1, 9, 96)
+    firmware_name: str = "Boiler"
+    power: bool = True
+    mode: Mode = Mode.MANUAL
+    setpoint: int = 50
+    temperature_high: int = 54
+    temperature_low: int = 52
+    relay: bool = False
+    errors: set[str] = field(default_factory=set)
+    silent: bool = False
+    requests: int = 0
+
+    @property
+    def discovered_device(self) -> DiscoveredDevice:
+        """Return the heater as discovery reports it."""
+        return DiscoveredDevice(
+            self.ip_address, f"{self.device_id:04X}", self.device_name
+        )
+
+    def respond(self, data: bytes) -> bytes | None:
+        """Apply a request and return the response, or None to stay silent."""
+        if self.silent or len(data) < 4 or not validate_checksum(data):
+            return None
+
+        command = data[0]
+        if command == COMMAND_DISCOVERY:
+            response = pack_discovery_response(self.device_id, self.device_name)
+        elif command == COMMAND_CONFIGURATION:
+            response = pack_configuration_response(
+                self.device_id,
+                self.device_name,
+                self.firmware_version,
+                self.firmware_name,
+            )
+        elif command == COMMAND_CONTROL_READ:
+            response = pack_control_read_response(
+                self.power,
+                setpoint=self.setpoint,
+                mode=self.mode,
+                temperature_high=self.temperature_high,
+                temperature_low=self.temperature_low,
+                relay=self.relay,
+                errors=self.errors,
+            )
+        elif (
+            command == COMMAND_CONTROL_WRITE and len(data) == CONTROL_WRITE_STRUCT.size
+        ):
+            _, _, _, power, setpoint, mode, _ = CONTROL_WRITE_STRUCT.unpack(data)
+            try:
+                self.mode = Mode(mode)
+            except ValueError:
+                return None
+            self.power = bool(power)
+            self.setpoint = setpoint // 10
+            response = CONTROL_WRITE_RESPONSE
+        else:
+            return None
+
+        self.requests += 1
+        return response
+
+
+class _HeaterProtocol(asyncio.DatagramProtocol):
+    """Protocol answering requests to one simulated heater."""
+
+    def __init__(self, heater: SimulatedHeater) -> None:
+        """Initialize with the heater to answer for."""
+        self.heater = heater
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: Any) -> None:
+        """Connect to transport."""
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple[str | Any, int]) -> None:
+        """Answer a request from a client."""
+        response = self.heater.respond(data)
+        if response is not None and self.transport is not None:
+            self.transport.sendto(response, addr)
+
+
+class _BroadcastProtocol(asyncio.DatagramProtocol):
+    """Protocol handing broadcast discovery requests to every heater."""
+
+    def __init__(self, heaters: list[_HeaterProtocol]) -> None:
+        """Initialize with the heaters to answer for."""
+        self.heaters = heaters
+
+    def datagram_received(self, data: bytes, addr: tuple[str | Any, int]) -> None:
+        """Answer a discovery request from each heater's own socket."""
+        if data[:1] != bytes([COMMAND_DISCOVERY]):
+            return
+        for heater in self.heaters:
+            heater.datagram_received(data, addr)
+
+
+def _create_socket(addr: tuple[str, int]) -> socket.socket:
+    """Create the UDP socket of a simulated heater or broadcast listener."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)  # Internet, UDP
+
+    if addr[1]:
+        # Share the heater port with clients and discovery on this host
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(addr)
+    return sock
+
+
+@dataclass
+class HeaterSimulator:
+    """Run simulated heaters on UDP sockets.
+
+    Each heater gets its own socket on its ip_address and port; a port of 0
+    is replaced by the ephemeral port bound. With broadcast, a listener on
+    the broadcast address answers TSmartDiscovery for every heater on the
+    heater port.
+    """
+
+    heaters: list[SimulatedHeater]
+    broadcast: bool = False
+
+    _transports: list[asyncio.DatagramTransport] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
+
+    @classmethod
+    def create(
+        cls,
+        count: int,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        broadcast: bool = False,
+    ) -> HeaterSimulator:
+        """Return a simulator of count heaters with distinct device ids.
+
+        With port 0 the heaters share host on ephemeral ports. Otherwise
+        they listen on port at consecutive addresses from host, such as
+        loopback addresses from 127.0.1.1.
+        """
+        first = ipaddress.IPv4Address(host)
+        return cls(
+            [
+                SimulatedHeater(
+                    ip_address=str(first + index if port else first),
+                    port=port,
+                    device_id=DEVICE_ID_BASE + index,
+                    device_name=f"SIM_{index:04d}",
+                )
+                for index in range(count)
+            ],
+            broadcast=broadcast,
+        )
+
+    @property
+    def devices(self) -> list[DiscoveredDevice]:
+        """Return the heaters as discovery reports them."""
+        return [heater.discovered_device for heater in self.heaters]
+
+    async def start(self) -> None:
+        """Open a socket for every heater."""
+        loop = asyncio.get_running_loop()
+        protocols = []
+
+        try:
+            for heater in self.heaters:
+                transport, protocol = await loop.create_datagram_endpoint(
+                    partial(_HeaterProtocol, heater),
+                    sock=_create_socket((heater.ip_address, heater.port)),
+                )
+                self._transports.append(transport)
+                protocols.append(protocol)
+                heater.port = transport.get_extra_info("sockname")[1]
+
+            if self.broadcast:
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _BroadcastProtocol(protocols),
+                    sock=_create_socket(BROADCAST_LISTEN_ADDR),
+                )
+                self._transports.append(transport)
+        except OSError:
+            self.close()
+            raise
+
+        _LOGGER.debug("Simulating %d heaters", len(self.heaters))
+
+    def close(self) -> None:
+        """Close the socket of every heater."""
+        for transport in self._transports:
+            transport.close()
+        self._transports.clear()
+
+    async def __aenter__(self) -> Self:
+        """Async enter.
+
+        Returns
+        -------
+            The HeaterSimulator object.
+        """
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_exc_info: object) -> None:
+        """Async exit.
+
+        Args:
+        ----
+            _exc_info: Exec type.
+        """
+        self.close()
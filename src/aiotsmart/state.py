@@ -0,0 +1,230 @@
+"""Device state shared by TSmart clients."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, replace
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from aiotsmart.codec import CONTROL_READ_RESPONSE_STRUCT, patch_control_read
+from aiotsmart.exceptions import TSmartCancelledError, TSmartError
+from aiotsmart.models import Configuration, DiscoveredDevice, Mode, Status
+
+from .const import UDP_PORT
+
+if TYPE_CHECKING:
+    from aiotsmart.tsmart import TSmartClient
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StatusPoller:
+    """Poll a heater on behalf of everything watching it.
+
+    Each subscriber queue holds only the newest changed status, so a slow
+    consumer skips intermediate changes rather than falling behind. A
+    failure other than a TSmartError stops polling and is handed to every
+    subscriber in place of a status.
+    """
+
+    def __init__(self, client: TSmartClient, interval: float) -> None:
+        """Initialize and start polling."""
+        self.client = client
+        self.interval = interval
+        self.last: Status | None = None
+        self.subscribers: set[asyncio.Queue[Status | Exception]] = set()
+        self.task = asyncio.create_task(self._poll())
+
+    def subscribe(
+        self, queue: asyncio.Queue[Status | Exception], interval: float
+    ) -> None:
+        """Add a subscriber, polling at its interval if that is shorter."""
+        self.interval = min(self.interval, interval)
+        self.subscribers.add(queue)
+        if self.last is not None:
+            queue.put_nowait(self.last)
+
+    def unsubscribe(self, queue: asyncio.Queue[Status | Exception]) -> bool:
+        """Remove a subscriber, stopping when none are left.
+
+        Returns if the poller stopped.
+        """
+        self.subscribers.discard(queue)
+        if self.subscribers:
+            return False
+
+        self.task.cancel()
+        return True
+
+    def _publish(self, status: Status) -> None:
+        """Hand a changed status to every subscriber."""
+        self.last = status
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(status)
+
+    def _fail(self, error: Exception) -> None:
+        """Hand the failure that stopped polling to every subscriber."""
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(error)
+
+    async def _poll(self) -> None:
+        """Poll until cancelled or failed, handing a failure to subscribers."""
+        try:
+            await self._poll_forever()
+        except Exception as ex:  # noqa: BLE001 pylint:disable=broad-exception-caught
+            _LOGGER.debug("Polling %s stopped: %r", self.client.ip_address, ex)
+            self._fail(ex)
+
+    async def _poll_forever(self) -> None:
+        """Read the heater every interval and publish changes."""
+        async with self.client:
+            while True:
+                try:
+                    status = await self.client.control_read()
+                except TSmartCancelledError as ex:
+                    task = asyncio.current_task()
+                    if task is not None and task.cancelling():
+                        raise asyncio.CancelledError from ex
+                except TSmartError as ex:
+                    _LOGGER.debug("Polling %s failed: %r", self.client.ip_address, ex)
+                else:
+                    # Comparing the raw frames is cheaper than every field
+                    if (
+                        self.last is None
+                        or status.raw_response != self.last.raw_response
+                    ):
+                        self._publish(status)
+
+                await asyncio.sleep(self.interval)
+
+
+@dataclass
+class DeviceState:
+    """State of a heater, shared by every client targeting its address."""
+
+    configuration: Configuration | None = None
+    configuration_time: float = 0.0
+    status: Status | None = None
+    status_time: float = 0.0
+    optimistic: bool = False
+    status_hits: int = 0
+    status_misses: int = 0
+    pending_write: tuple[bool, Mode, int] | None = None
+    pending_write_done: asyncio.Future[None] | None = None
+    write_task: asyncio.Task[None] | None = None
+    poller: StatusPoller | None = None
+
+    def cached_configuration(self, ttl: float) -> Configuration | None:
+        """Return the cached configuration if younger than ttl seconds."""
+        if (
+            self.configuration is not None
+            and time.monotonic() - self.configuration_time < ttl
+        ):
+            return self.configuration
+        return None
+
+    def set_configuration(
+        self, configuration: Configuration, now: float | None = None
+    ) -> None:
+        """Cache a configuration read from the heater at now, by default now."""
+        self.configuration = configuration
+        self.configuration_time = time.monotonic() if now is None else now
+
+    def invalidate_configuration(self) -> None:
+        """Drop the cached configuration."""
+        self.configuration = None
+
+    def cached_status(self, max_age: float) -> Status | None:
+        """Return the cached status if younger than max_age seconds."""
+        if self.status is not None and time.monotonic() - self.status_time < max_age:
+            self.status_hits += 1
+            return self.status
+
+        self.status_misses += 1
+        return None
+
+    def set_status(self, status: Status) -> None:
+        """Cache a status read from the heater."""
+        self.status = status
+        self.status_time = time.monotonic()
+        self.optimistic = False
+
+    def invalidate_status(self) -> None:
+        """Drop the cached status."""
+        self.status = None
+        self.optimistic = False
+
+    def write_task_done(self, task: asyncio.Task[None]) -> None:
+        """Fail the callers of a coalesced write left when the drain stops."""
+        if task is not self.write_task:
+            return
+
+        done = self.pending_write_done
+        self.pending_write = None
+        self.pending_write_done = None
+        if done is not None and not done.done():
+            done.set_exception(TSmartCancelledError())
+
+    def apply_write(self, power: bool, mode: Mode, setpoint: int) -> None:
+        """Apply an acknowledged write to the cached status.
+
+        The status is marked optimistic until the next read from the heater
+        reconciles it. Its raw response is patched to match, so it reads as
+        the frame the heater will send. Without a cached status there is
+        nothing to update.
+        """
+        if self.status is None:
+            return
+
+        raw_response = self.status.raw_response
+        if len(raw_response) == CONTROL_READ_RESPONSE_STRUCT.size:
+            raw_response = patch_control_read(raw_response, power, mode, setpoint)
+
+        self.status = replace(
+            self.status,
+            power=power,
+            mode=Mode(mode),
+            setpoint=setpoint,
+            raw_response=raw_response,
+        )
+        self.optimistic = True
+
+
+_DEVICE_STATES: dict[tuple[str, int], DeviceState] = {}
+
+
+def get_device_state(addr: tuple[str, int]) -> DeviceState:
+    """Return the shared state for the heater at an address."""
+    state = _DEVICE_STATES.get(addr)
+    if state is None:
+        state = _DEVICE_STATES[addr] = DeviceState()
+    return state
+
+
+def find_device_state(addr: tuple[str, int]) -> DeviceState | None:
+    """Return the shared state for the heater at an address, if it has any."""
+    return _DEVICE_STATES.get(addr)
+
+
+def device_discovered(device: DiscoveredDevice) -> None:
+    """Drop a cached configuration that no longer matches a discovered heater.
+
+    A changed device id or name at an address means the heater was replaced,
+    renamed or has rebooted with new settings.
+    """
+    state = _DEVICE_STATES.get((device.ip_address, UDP_PORT))
+    if state is None or state.configuration is None:
+        return
+
+    if (
+        state.configuration.device_id != device.device_id
+        or state.configuration.device_name != device.device_name
+    ):
+        _LOGGER.debug("Configuration of %s changed", device.ip_address)
+        state.invalidate_configuration()
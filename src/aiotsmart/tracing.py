@@ -0,0 +1,60 @@
+"""Tracing hooks around the TSmart request lifecycle."""
+
+from __future__ import annotations
+
+
+class TSmartTracer:
+    """Hooks called at each step of a request, for profiling and tracing.
+
+    Subclass and override the hooks of interest; the others do nothing.
+    Every hook gets a time.monotonic() timestamp, the heater's address and
+    the command byte of the request. Hooks run inline on the event loop, so
+    they should only record what they are given.
+
+    A request that is lost is sent again, calling datagram_sent once per
+    send. A request ends with exactly one of request_resolved,
+    request_timeout and request_cancelled.
+    """
+
+    def socket_created(
+        self, timestamp: float, peer: tuple[str, int], command: int | None
+    ) -> None:
+        """Call when a request opens the shared socket.
+
+        Command is None when the socket is opened by async with.
+        """
+
+    def datagram_sent(
+        self, timestamp: float, peer: tuple[str, int], command: int
+    ) -> None:
+        """Call when a request is sent or sent again."""
+
+    def datagram_received(
+        self, timestamp: float, peer: tuple[str, int], command: int
+    ) -> None:
+        """Call when the response to a request is received."""
+
+    def unpack_started(
+        self, timestamp: float, peer: tuple[str, int], command: int
+    ) -> None:
+        """Call when a response starts being validated and decoded."""
+
+    def unpack_finished(
+        self, timestamp: float, peer: tuple[str, int], command: int
+    ) -> None:
+        """Call when a response is decoded or rejected."""
+
+    def request_resolved(
+        self, timestamp: float, peer: tuple[str, int], command: int
+    ) -> None:
+        """Call when the caller resumes with a response or bad response."""
+
+    def request_timeout(
+        self, timestamp: float, peer: tuple[str, int], command: int
+    ) -> None:
+        """Call when a request is given up without a response."""
+
+    def request_cancelled(
+        self, timestamp: float, peer: tuple[str, int], command: int
+    ) -> None:
+        """Call when the caller is cancelled while waiting for a response."""
@@ -3,37 +3,59 @@
 from __future__ import annotations
 
 import asyncio
-from dataclasses import dataclass
+import collections
+from dataclasses import dataclass, field, replace
+import ipaddress
+import itertools
 import logging
 import socket
-import struct
-from typing import Any, Self, Callable
-
+import time
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Self, Callable
+import weakref
+
+from aiotsmart.codec import (
+    COMMAND_CONTROL_WRITE,
+    COMMAND_DISCOVERY,
+    CONFIGURATION_REQUEST,
+    CONFIGURATION_RESPONSE_STRUCT,
+    CONTROL_READ_REQUEST,
+    CONTROL_READ_RESPONSE_STRUCT,
+    CONTROL_WRITE_RESPONSE,
+    decode_configuration,
+    decode_control_read,
+    pack_control_write,
+)
 from aiotsmart.exceptions import (
     TSmartBadResponseError,
     TSmartCancelledError,
+    TSmartChecksumError,
+    TSmartError,
     TSmartTimeoutError,
 )
+from aiotsmart.history import HistoryStore
+from aiotsmart.metrics import TSmartMetrics
 from aiotsmart.models import Configuration, Mode, Status
-from aiotsmart.util import validate_checksum, add_checksum
+from aiotsmart.state import DeviceState, StatusPoller, get_device_state
+from aiotsmart.util import RttEstimator, validate_checksum
+
+from .const import UDP_PORT
 
-from .const import MESSAGE_HEADER, UDP_PORT
+if TYPE_CHECKING:
+    from aiotsmart.capture import CaptureWriter
+    from aiotsmart.tracing import TSmartTracer
 
 _LOGGER = logging.getLogger(__name__)
 TIMEOUT = 5  # seconds
+RETRIES = 3
+WATCH_INTERVAL = 10  # seconds
 
 
-# pylint:disable=too-many-locals
-def _unpack_configuration_response(
-    request: bytearray, data: bytes
-) -> Configuration | None:
-    """Return unpacked configuration response from TSmart Immersion Heater."""
-    response_struct = struct.Struct("=BBBHL32sBBBBB32s28s32s64s124s")
+def _validate_response(request: bytes, data: bytes, size: int) -> None:
+    """Raise if a response is not a valid reply to the request."""
 
-    if len(data) != response_struct.size:
+    if len(data) != size:
         raise TSmartBadResponseError(
-            "Unexpected packet length (got: %d, expected: %d)"
-            % (len(data), response_struct.size)
+            "Unexpected packet length (got: %d, expected: %d)" % (len(data), size)
         )
 
     if data[0] == 0:
@@ -45,261 +67,787 @@ def _unpack_configuration_response(
         )
 
     if not validate_checksum(data):
-        raise TSmartBadResponseError("Received packet checksum failed")
-
-    # pylint:disable=unused-variable
-    (
-        cmd,
-        sub,
-        sub2,
-        device_type,
-        device_id,
-        device_name,
-        tz,
-        userbin,
-        firmware_version_major,
-        firmware_version_minor,
-        firmware_version_deployment,
-        firmware_name,
-        legacy,
-        wifi_ssid,
-        wifi_password,
-        unused,
-    ) = response_struct.unpack(data)
-
-    configuration = Configuration(
-        device_id=f"{device_id:04X}",
-        device_name=device_name.decode("utf-8").split("\x00")[0],
-        firmware_version=f"{firmware_version_major}.{firmware_version_minor}.{firmware_version_deployment}",
-        firmware_name=firmware_name.decode("utf-8").split("\x00")[0],
-        raw_response=data,
-    )
+        raise TSmartChecksumError("Received packet checksum failed")
+
+
+def _unpack_configuration_response(request: bytes, data: bytes) -> Configuration:
+    """Return unpacked configuration response from TSmart Immersion Heater."""
+    _validate_response(request, data, CONFIGURATION_RESPONSE_STRUCT.size)
+
+    configuration = Configuration(*decode_configuration(data), raw_response=data)
     _LOGGER.info(
-        "Configuration received %s %s"
-        % (configuration.device_id, configuration.device_name)
+        "Configuration received %s %s",
+        configuration.device_id,
+        configuration.device_name,
     )
 
     return configuration
 
 
-# pylint:disable=too-many-locals
-def _unpack_control_read_response(request: bytearray, data: bytes) -> Status | None:
+def _unpack_control_read_response(request: bytes, data: bytes) -> Status:
     """Return unpacked control read response from TSmart Immersion Heater."""
-    response_struct = struct.Struct("=BBBBHBHBBH16sB")
-
-    if len(data) != response_struct.size:
-        raise TSmartBadResponseError(
-            "Unexpected packet length (got: %d, expected: %d)"
-            % (len(data), response_struct.size)
-        )
-
-    if data[0] == 0:
-        raise TSmartBadResponseError(("Got error response (code %d)" % (data[0])))
-
-    if data[0] != request[0]:
-        raise TSmartBadResponseError(
-            "Unexpected response type (%02X %02X %02X)" % (data[0], data[1], data[2])
-        )
-
-    if not validate_checksum(data):
-        raise TSmartBadResponseError("Received packet checksum failed")
-
-    # pylint:disable=unused-variable
-    (
-        cmd,
-        sub,
-        sub2,
-        power,
-        setpoint,
-        mode,
-        t_high,
-        relay,
-        smart_state,
-        t_low,
-        error_buffer,
-        checksum,
-    ) = response_struct.unpack(data)
-
-    status = Status(
-        power=bool(power),
-        setpoint=int(setpoint / 10),
-        mode=Mode(mode),
-        temperature_high=int(t_high / 10),
-        temperature_low=int(t_low / 10),
-        temperature_average=int((t_high + t_low) / 20),
-        relay=bool(relay),
-        error_e01=(error_buffer[0] >> 7) & 1 == 1,
-        error_e02=(error_buffer[2] >> 7) & 1 == 1,
-        error_e03=(error_buffer[4] >> 7) & 1 == 1,
-        error_e04=(error_buffer[6] >> 7) & 1 == 1,
-        error_w01=(error_buffer[8] >> 7) & 1 == 1,
-        error_w02=(error_buffer[10] >> 7) & 1 == 1,
-        error_w03=(error_buffer[12] >> 7) & 1 == 1,
-        error_e05=(error_buffer[14] >> 7) & 1 == 1,
+    _validate_response(request, data, CONTROL_READ_RESPONSE_STRUCT.size)
+
+    fields = decode_control_read(data)
+    return Status(
+        fields.power,
+        fields.setpoint,
+        Mode(fields.mode),
+        *fields[3:],
         raw_response=data,
     )
-    return status
 
 
-# pylint:disable=too-many-locals
-def _unpack_control_write_response(_: bytearray, data: bytes) -> None:
+def _unpack_control_write_response(_: bytes, data: bytes) -> None:
     """Return unpacked control write response from TSmart Immersion Heater."""
 
-    if data != b"\xf2\x00\x00\xa7":
+    if data != CONTROL_WRITE_RESPONSE:
         raise TSmartBadResponseError
 
 
+@dataclass
+class _PendingRequest:
+    """Request waiting for a response on the shared transport."""
+
+    request: bytes
+    unpack_function: Callable[[bytes, bytes], Any]
+    future: asyncio.Future[Any]
+    sequence: int
+    tracer: TSmartTracer | None = None
+    capture: CaptureWriter | None = None
+    sends: int = 1
+
+
 class TsmartProtocol(asyncio.DatagramProtocol):
-    """Protocol to send request and receive responses."""
+    """Protocol to multiplex requests and responses over a shared socket.
+
+    Requests are correlated with responses on (peer, command). Overlapping
+    requests with the same peer and command are answered in the order they
+    were sent, as the heater replies to them in turn. A retransmitted
+    request may be answered once per send, so the replies still owed when
+    it finishes are dropped rather than matched to a newer request, until
+    they are a retransmission timeout late.
+
+    Requests sent with a tracer call its hooks as they are sent, answered
+    and decoded. Requests sent with a capture record themselves and the
+    response matched to them.
+
+    Discovery responses are handed to the listeners added, such as a
+    DiscoveryProtocol, so discovery shares the socket of the clients.
+    """
+
+    def __init__(self) -> None:
+        """Initialize with an empty correlation table."""
+        self.transport: asyncio.DatagramTransport | None = None
+        self._pending: dict[
+            tuple[tuple[str, int], int], collections.deque[_PendingRequest]
+        ] = {}
+        self.listeners: list[asyncio.DatagramProtocol] = []
+        self._owed: dict[tuple[tuple[str, int], int], tuple[int, float]] = {}
+        self._sequence = itertools.count()
+        self.rtt_estimators: dict[tuple[str, int], RttEstimator] = {}
+        self.in_flight: dict[tuple[tuple[str, int], int], asyncio.Task[Any]] = {}
+
+    def connection_made(self, transport: Any) -> None:
+        """Connect to transport."""
+        self.transport = transport
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        """Fail any requests still waiting when the socket closes."""
+        for queue in self._pending.values():
+            for pending in queue:
+                if not pending.future.done():
+                    pending.future.set_exception(TSmartCancelledError())
+        self._pending.clear()
+
+    def send(
+        self,
+        addr: tuple[str, int],
+        request: bytes,
+        unpack_function: Callable[[bytes, bytes], Any],
+        *,
+        tracer: TSmartTracer | None = None,
+        capture: CaptureWriter | None = None,
+    ) -> asyncio.Future[Any]:
+        """Send a request and return a future for the matching response."""
+        assert self.transport is not None
+
+        future = self.expect(
+            addr, request, unpack_function, tracer=tracer, capture=capture
+        )
+        if capture is not None:
+            capture.sent(request, addr)
+        self.transport.sendto(request, addr)
+        if tracer is not None:
+            tracer.datagram_sent(time.monotonic(), addr, request[0])
+        return future
+
+    def expect(
+        self,
+        addr: tuple[str, int],
+        request: bytes,
+        unpack_function: Callable[[bytes, bytes], Any],
+        *,
+        tracer: TSmartTracer | None = None,
+        capture: CaptureWriter | None = None,
+    ) -> asyncio.Future[Any]:
+        """Return a future for the response to a request, without sending it."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault((addr, request[0]), collections.deque()).append(
+            _PendingRequest(
+                request,
+                unpack_function,
+                future,
+                next(self._sequence),
+                tracer,
+                capture,
+            )
+        )
+        return future
 
-    def __init__(
-        self, request: bytearray, unpack_function: Callable[[bytearray, bytes], Any]
+    def retransmit(
+        self, addr: tuple[str, int], command: int, future: asyncio.Future[Any]
+    ) -> None:
+        """Send a pending request again, keeping its place in the table."""
+        assert self.transport is not None
+
+        pending = self._find(addr, command, future)
+        if pending is None:
+            return
+
+        pending.sends += 1
+        request = pending.request
+        if pending.capture is not None:
+            pending.capture.retransmitted(request, addr)
+        self.transport.sendto(request, addr)
+        if pending.tracer is not None:
+            pending.tracer.datagram_sent(time.monotonic(), addr, command)
+
+    def is_latest(
+        self, addr: tuple[str, int], command: int, future: asyncio.Future[Any]
+    ) -> bool:
+        """Return if no newer request with the same peer and command is pending."""
+        queue = self._pending.get((addr, command))
+        return queue is not None and queue[-1].future is future
+
+    def finish_in_flight(
+        self, key: tuple[tuple[str, int], int], task: asyncio.Task[Any]
+    ) -> None:
+        """Forget a finished single-flight request."""
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+
+        # Every joined caller may have been cancelled before the result arrived
+        if not task.cancelled():
+            task.exception()
+
+    def estimator(self, addr: tuple[str, int]) -> RttEstimator:
+        """Return the round trip time estimator for a peer."""
+        estimator = self.rtt_estimators.get(addr)
+        if estimator is None:
+            estimator = self.rtt_estimators[addr] = RttEstimator()
+        return estimator
+
+    def _find(
+        self, addr: tuple[str, int], command: int, future: asyncio.Future[Any]
+    ) -> _PendingRequest | None:
+        """Return the pending request of a future."""
+        for pending in self._pending.get((addr, command), ()):
+            if pending.future is future:
+                return pending
+        return None
+
+    def discard(
+        self, addr: tuple[str, int], command: int, future: asyncio.Future[Any]
     ) -> None:
-        """Initialize with callback function."""
-        self.request = request
-        self.unpack_function = unpack_function
-        self.done = asyncio.get_running_loop().create_future()
+        """Stop waiting for a response to a request.
+
+        A request discarded unanswered may still be answered once per send.
+        """
+        key = (addr, command)
+        pending = self._find(addr, command, future)
+        if pending is None:
+            return
+
+        queue = self._pending[key]
+        queue.remove(pending)
+        if not queue:
+            del self._pending[key]
+        self._owe(key, pending.sends)
+
+    def _owe(self, key: tuple[tuple[str, int], int], replies: int) -> None:
+        """Expect replies to a request that is no longer pending."""
+        if not replies:
+            return
+        owed, _ = self._owed.get(key, (0, 0.0))
+        self._owed[key] = (
+            owed + replies,
+            time.monotonic() + self.estimator(key[0]).rto,
+        )
+
+    def _owed_reply(self, key: tuple[tuple[str, int], int]) -> bool:
+        """Return if a reply is owed to a finished request, settling it."""
+        owed = self._owed.pop(key, None)
+        if owed is None:
+            return False
+
+        replies, deadline = owed
+        if time.monotonic() > deadline:
+            return False
+        if replies > 1:
+            self._owed[key] = (replies - 1, deadline)
+        return True
+
+    def _pop(self, addr: tuple[str, int], command: int) -> _PendingRequest | None:
+        """Remove and return the oldest request for a peer and command.
+
+        An error response carries command 0, so it is matched to the oldest
+        request sent to that peer whatever its command.
+        """
+        if command == 0:
+            keys = [key for key in self._pending if key[0] == addr]
+            if not keys:
+                return None
+            key = min(keys, key=lambda key: self._pending[key][0].sequence)
+        else:
+            key = (addr, command)
+            if key not in self._pending:
+                return None
+
+        queue = self._pending[key]
+        pending = queue.popleft()
+        if not queue:
+            del self._pending[key]
+        return pending
 
     def datagram_received(self, data: bytes, addr: tuple[str | Any, int]) -> None:
-        """Test if responder is a TSmart Immersion Heater."""
-        _LOGGER.debug("Received configuration response from %s", addr)
-        response = self.unpack_function(self.request, data)
+        """Hand a response to the request waiting on its peer and command."""
+        _LOGGER.debug("Received response from %s", addr)
+        if not data:
+            return
+
+        if data[0] == COMMAND_DISCOVERY:
+            for listener in self.listeners:
+                listener.datagram_received(data, addr)
+            return
+
+        peer = (addr[0], addr[1])
+        if self._owed and self._owed_reply((peer, data[0])):
+            _LOGGER.debug("Ignoring late reply to a retransmission from %s", addr)
+            return
+
+        pending = self._pop(peer, data[0])
+        if pending is None:
+            _LOGGER.debug("Ignoring unexpected response from %s", addr)
+            return
+
+        self._owe((peer, pending.request[0]), pending.sends - 1)
+        if pending.capture is not None:
+            pending.capture.received(data, addr)
+        self._complete(pending, data, peer)
+
+    @staticmethod
+    def _complete(pending: _PendingRequest, data: bytes, peer: tuple[str, int]) -> None:
+        """Decode the response to a request into its future."""
+        command = pending.request[0]
+        tracer = pending.tracer
+        if tracer is not None:
+            tracer.datagram_received(time.monotonic(), peer, command)
+
+        if pending.future.done():
+            return
 
-        self.done.set_result(response)
+        try:
+            if tracer is not None:
+                tracer.unpack_started(time.monotonic(), peer, command)
+            try:
+                response = pending.unpack_function(pending.request, data)
+            finally:
+                if tracer is not None:
+                    tracer.unpack_finished(time.monotonic(), peer, command)
+        except TSmartBadResponseError as ex:
+            pending.future.set_exception(ex)
+        else:
+            pending.future.set_result(response)
 
 
 @dataclass
-class TSmartClient:
-    """TSmart Client."""
+class _SharedEndpoint:
+    """UDP endpoint shared by every client on an event loop."""
 
-    ip_address: str
+    transport: asyncio.DatagramTransport
+    protocol: TsmartProtocol
+    local_port: int
+    users: int = 0
 
-    def create_socket(self) -> socket.socket:
-        """Create a UDP socket."""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)  # Internet, UDP
 
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(("", 1337))
-        sock.connect((self.ip_address, UDP_PORT))
-        return sock
+_ENDPOINTS: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[int, _SharedEndpoint]
+] = weakref.WeakKeyDictionary()
 
-    async def configuration_read(self) -> Configuration:
-        """Get configuration from immersion heater."""
 
-        loop = asyncio.get_running_loop()
+def _create_socket(local_port: int) -> socket.socket:
+    """Create the UDP socket used by a shared endpoint.
+
+    A local port of 0 binds an ephemeral port chosen by the OS. Broadcast is
+    enabled for discovery, which shares the endpoint on the heater port.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)  # Internet, UDP
+
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    if local_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("", local_port))
+    return sock
 
-        sock = self.create_socket()
 
-        request = struct.pack(MESSAGE_HEADER, 0x21, 0, 0, 0)
-        request_checksum = add_checksum(request)
+async def _acquire_endpoint(
+    local_port: int = UDP_PORT, on_created: Callable[[], None] | None = None
+) -> _SharedEndpoint:
+    """Return the shared endpoint for the running loop, opening it if needed.
 
+    On_created is called when this call opens the socket.
+    """
+    loop = asyncio.get_running_loop()
+    endpoints = _ENDPOINTS.setdefault(loop, {})
+
+    endpoint = endpoints.get(local_port)
+    if endpoint is None or endpoint.transport.is_closing():
         transport, protocol = await loop.create_datagram_endpoint(
-            lambda: TsmartProtocol(request_checksum, _unpack_configuration_response),
-            sock=sock,
+            TsmartProtocol, sock=_create_socket(local_port)
         )
 
-        try:
-            _LOGGER.debug("Sending configuration message.")
-            async with asyncio.timeout(TIMEOUT):
-                transport.sendto(request_checksum, (self.ip_address, UDP_PORT))
-                configuration: Configuration = await protocol.done
-        except asyncio.TimeoutError as ex:
-            raise TSmartTimeoutError() from ex
-        except asyncio.CancelledError as ex:
-            raise TSmartCancelledError() from ex
-
-        finally:
+        # Another client may have opened the endpoint while we were waiting
+        endpoint = endpoints.get(local_port)
+        if endpoint is None or endpoint.transport.is_closing():
+            endpoint = _SharedEndpoint(transport, protocol, local_port)
+            endpoints[local_port] = endpoint
+            if on_created is not None:
+                on_created()
+        else:
             transport.close()
-            sock.close()
 
-        _LOGGER.info("Received configuration from %s" % self.ip_address)
+    endpoint.users += 1
+    return endpoint
 
-        return configuration
 
-    # pylint:disable=too-many-locals
-    async def control_read(self) -> Status:
-        """Get status from the immersion heater."""
+def _release_endpoint(endpoint: _SharedEndpoint) -> None:
+    """Release the shared endpoint, closing it once it has no users."""
+    endpoint.users -= 1
+    if endpoint.users > 0:
+        return
 
-        loop = asyncio.get_running_loop()
+    endpoint.transport.close()
+    for endpoints in _ENDPOINTS.values():
+        if endpoints.get(endpoint.local_port) is endpoint:
+            del endpoints[endpoint.local_port]
 
-        sock = self.create_socket()
 
-        request = struct.pack(MESSAGE_HEADER, 0xF1, 0, 0, 0)
-        request_checksum = add_checksum(request)
+@dataclass
+class TSmartClient:
+    """TSmart Client.
 
-        transport, protocol = await loop.create_datagram_endpoint(
-            lambda: TsmartProtocol(request_checksum, _unpack_control_read_response),
-            sock=sock,
-        )
+    Requests from every client on an event loop share one UDP endpoint per
+    local port, so overlapping requests are safe. Set local_port to 0 to send
+    from an ephemeral port for heaters that reply to the source port.
+
+    Lost requests are retransmitted up to retries times on a timer adapted to
+    each heater's round trip time, within an overall deadline of timeout
+    seconds. With metrics, the number of sends each call took is counted.
+
+    With configuration_ttl set, configuration_read returns the configuration
+    cached for the heater until it is that many seconds old. The cache is
+    dropped early when the heater stops answering or is rediscovered with a
+    different id or name.
+
+    With coalesce_writes, rapid writes to a heater are collapsed so only the
+    newest values are sent, optionally waiting write_debounce seconds before
+    each write to collect more changes.
+
+    With history, every status read from the heater is recorded in the
+    store under its IP address.
+
+    Heaters listen on UDP port 1337; set port to reach one elsewhere, such
+    as a simulated heater. A hostname given as ip_address is resolved to its
+    IPv4 address on first use, as replies are matched on their source
+    address.
+
+    With metrics, every request is counted with its outcome and latency.
+
+    With tracer, its hooks are called at each step of every request.
+
+    With capture, every datagram this client sends and every response
+    matched to its requests is recorded to the capture file.
+    """
+
+    ip_address: str
+    local_port: int = UDP_PORT
+    timeout: float = TIMEOUT
+    retries: int = RETRIES
+    configuration_ttl: float | None = None
+    coalesce_writes: bool = False
+    write_debounce: float = 0
+    history: HistoryStore | None = None
+    port: int = UDP_PORT
+    metrics: TSmartMetrics | None = field(default=None, repr=False, compare=False)
+    tracer: TSmartTracer | None = field(default=None, repr=False, compare=False)
+    capture: CaptureWriter | None = field(default=None, repr=False, compare=False)
+
+    _endpoint: _SharedEndpoint | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _addr: tuple[str, int] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    async def _request(
+        self,
+        request: bytes,
+        unpack_function: Callable[[bytes, bytes], Any],
+        *,
+        single_flight: bool = False,
+    ) -> Any:
+        """Send a request over the shared endpoint and return the response.
+
+        With single_flight, a caller finding the same request already in
+        flight to this heater waits for its response instead of sending.
+        """
+
+        addr = self._addr or await self._resolve()
+        endpoint = self._endpoint or await self._acquire_endpoint(request[0])
+        protocol = endpoint.protocol
+        key = (addr, request[0])
 
         try:
-            _LOGGER.debug("Sending control message.")
-            async with asyncio.timeout(TIMEOUT):
-                transport.sendto(request_checksum, (self.ip_address, UDP_PORT))
-                status: Status = await protocol.done
-        except asyncio.TimeoutError as ex:
-            raise TSmartTimeoutError() from ex
+            if not single_flight:
+                return await self._exchange(protocol, addr, request, unpack_function)
+
+            task = protocol.in_flight.get(key)
+            if task is None:
+                task = asyncio.create_task(
+                    self._exchange(protocol, addr, request, unpack_function)
+                )
+                protocol.in_flight[key] = task
+                task.add_done_callback(
+                    lambda done: protocol.finish_in_flight(key, done)
+                )
+            else:
+                _LOGGER.debug("Joining request in flight to %s", self.ip_address)
+
+            return await asyncio.shield(task)
 
         except asyncio.CancelledError as ex:
             raise TSmartCancelledError() from ex
 
         finally:
-            transport.close()
-            sock.close()
+            if endpoint is not self._endpoint:
+                _release_endpoint(endpoint)
 
-        _LOGGER.info("Received control from %s" % self.ip_address)
+    # pylint:disable=too-many-locals
+    async def _exchange(
+        self,
+        protocol: TsmartProtocol,
+        addr: tuple[str, int],
+        request: bytes,
+        unpack_function: Callable[[bytes, bytes], Any],
+    ) -> Any:
+        """Send a request, retransmitting until answered, and return the response."""
 
-        return status
+        command = request[0]
 
-    async def control_write(self, power: bool, mode: Mode, setpoint: int) -> None:
-        """Set the immersion heater."""
+        loop = asyncio.get_running_loop()
+        estimator = protocol.estimator(addr)
+        metrics = self.metrics
+        tracer = self.tracer
+        capture = self.capture
+        if metrics is not None:
+            metrics.request_started(self._metrics_key, command)
+        sent = loop.time()
+        future = protocol.send(
+            addr, request, unpack_function, tracer=tracer, capture=capture
+        )
+        attempts = 1
+        error: BaseException | None = None
+
+        try:
+            async with asyncio.timeout(self.timeout):
+                retry = True
+                while not future.done():
+                    done, _ = await asyncio.wait(
+                        [future],
+                        timeout=estimator.rto
+                        if retry and attempts <= self.retries
+                        else None,
+                    )
+                    if done:
+                        break
+
+                    # A retransmitted write must not overtake a newer write
+                    if command == COMMAND_CONTROL_WRITE and not protocol.is_latest(
+                        addr, command, future
+                    ):
+                        retry = False
+                        continue
+
+                    _LOGGER.debug("Retransmitting %02X to %s", command, self.ip_address)
+                    estimator.backoff()
+                    protocol.retransmit(addr, command, future)
+                    attempts += 1
+
+                if tracer is not None:
+                    tracer.request_resolved(time.monotonic(), addr, command)
+                if attempts == 1:
+                    # Only unambiguous round trips feed the estimate (Karn)
+                    estimator.update(loop.time() - sent)
+
+                return future.result()
+        except asyncio.TimeoutError as ex:
+            if tracer is not None:
+                tracer.request_timeout(time.monotonic(), addr, command)
+            # The heater may be rebooting, possibly into new firmware
+            self.state.invalidate_configuration()
+            error = TSmartTimeoutError()
+            raise error from ex
+        except BaseException as ex:
+            if tracer is not None and isinstance(ex, asyncio.CancelledError):
+                tracer.request_cancelled(time.monotonic(), addr, command)
+            error = ex
+            raise
 
-        _LOGGER.info("Control set %d %d %0.2f" % (power, mode, setpoint))
+        finally:
+            protocol.discard(addr, command, future)
+            if metrics is not None:
+                metrics.request_finished(
+                    self._metrics_key, attempts, loop.time() - sent, error
+                )
+
+    async def _acquire_endpoint(self, command: int | None) -> _SharedEndpoint:
+        """Acquire the shared endpoint, tracing the socket if this opens it."""
+        tracer = self.tracer
+        if tracer is None:
+            return await _acquire_endpoint(self.local_port)
+
+        addr = self._addr or await self._resolve()
+        return await _acquire_endpoint(
+            self.local_port,
+            lambda: tracer.socket_created(time.monotonic(), addr, command),
+        )
 
-        loop = asyncio.get_running_loop()
+    async def _resolve(self) -> tuple[str, int]:
+        """Return the address of the heater, resolving a hostname once."""
+        host = self.ip_address
+        try:
+            ipaddress.IPv4Address(host)
+        except ValueError:
+            try:
+                addresses = await asyncio.get_running_loop().getaddrinfo(
+                    host, self.port, family=socket.AF_INET, type=socket.SOCK_DGRAM
+                )
+            except OSError as ex:
+                raise TSmartError(f"Cannot resolve {host}: {ex}") from ex
+            host = str(addresses[0][4][0])
+            _LOGGER.debug("Resolved %s to %s", self.ip_address, host)
+
+        self._addr = (host, self.port)
+        return self._addr
+
+    @property
+    def _metrics_key(self) -> str:
+        """Return the key of this heater in the metrics."""
+        if self.port == UDP_PORT:
+            return self.ip_address
+        return f"{self.ip_address}:{self.port}"
+
+    @property
+    def state(self) -> DeviceState:
+        """Return the state shared by clients of this heater."""
+        return get_device_state((self.ip_address, self.port))
+
+    @property
+    def status(self) -> Status | None:
+        """Return the last known status without a request.
+
+        This is the last status read from the heater with any writes it has
+        since acknowledged applied, or None if it has not been read.
+        """
+        return self.state.status
+
+    def invalidate_configuration(self) -> None:
+        """Drop the cached configuration of this heater."""
+        self.state.invalidate_configuration()
 
-        sock = self.create_socket()
+    async def configuration_read(self) -> Configuration:
+        """Get configuration from immersion heater.
 
-        request = struct.pack(
-            "=BBBBHBB", 0xF2, 0, 0, 1 if power else 0, setpoint * 10, mode, 0
+        Concurrent reads of the same heater share a single request.
+        """
+
+        if self.configuration_ttl is not None:
+            cached = self.state.cached_configuration(self.configuration_ttl)
+            if cached is not None:
+                return cached
+
+        _LOGGER.debug("Sending configuration message.")
+        configuration: Configuration = await self._request(
+            CONFIGURATION_REQUEST, _unpack_configuration_response, single_flight=True
         )
-        request_checksum = add_checksum(request)
 
-        transport, protocol = await loop.create_datagram_endpoint(
-            lambda: TsmartProtocol(request_checksum, _unpack_control_write_response),
-            sock=sock,
+        self.state.set_configuration(configuration)
+
+        _LOGGER.info("Received configuration from %s", self.ip_address)
+
+        return configuration
+
+    async def control_read(self, max_age: float | None = None) -> Status:
+        """Get status from the immersion heater.
+
+        With max_age, a status read by any client of this heater less than
+        max_age seconds ago is returned without a request. Concurrent reads
+        of the same heater share a single request.
+        """
+
+        if max_age is not None:
+            cached = self.state.cached_status(max_age)
+            if cached is not None:
+                return cached
+
+        _LOGGER.debug("Sending control message.")
+        status: Status = await self._request(
+            CONTROL_READ_REQUEST, _unpack_control_read_response, single_flight=True
         )
 
+        self.state.set_status(status)
+        if self.history is not None:
+            self.history.record(self.ip_address, status)
+
+        _LOGGER.info("Received control from %s", self.ip_address)
+
+        return status
+
+    async def watch(
+        self, interval: float = WATCH_INTERVAL
+    ) -> AsyncGenerator[Status, None]:
+        """Yield the status of the immersion heater each time it changes.
+
+        The current status is yielded first. A single poll loop per heater
+        serves every watch of it, polling at the shortest interval asked for,
+        and stops when the last watch is closed. An error that stops the
+        poll loop, such as failing to open its socket, is raised from every
+        watch.
+        """
+
+        state = self.state
+        poller = state.poller
+        if poller is None or poller.task.done():
+            poller = state.poller = StatusPoller(replace(self), interval)
+
+        queue: asyncio.Queue[Status | Exception] = asyncio.Queue(maxsize=1)
+        poller.subscribe(queue, interval)
         try:
-            _LOGGER.debug("Sending control message.")
-            async with asyncio.timeout(TIMEOUT):
-                transport.sendto(request_checksum, (self.ip_address, UDP_PORT))
-                await protocol.done
-        except asyncio.TimeoutError as ex:
-            raise TSmartTimeoutError() from ex
+            while True:
+                status = await queue.get()
+                if isinstance(status, Exception):
+                    raise status
+                yield status
+        finally:
+            if poller.unsubscribe(queue) and state.poller is poller:
+                state.poller = None
+
+    async def control_write(self, power: bool, mode: Mode, setpoint: int) -> None:
+        """Set the immersion heater.
+
+        With coalesce_writes, writes made while another write to this heater
+        is being sent are collapsed into one write of the newest values, and
+        every collapsed caller gets the result of that write.
+        """
 
+        if not self.coalesce_writes:
+            await self._control_write(power, mode, setpoint)
+            return
+
+        state = self.state
+        state.pending_write = (power, mode, setpoint)
+        if state.pending_write_done is None:
+            state.pending_write_done = asyncio.get_running_loop().create_future()
+        done = state.pending_write_done
+
+        if state.write_task is None or state.write_task.done():
+            state.write_task = asyncio.create_task(self._drain_writes())
+            # A drain cancelled before it starts never runs its cleanup
+            state.write_task.add_done_callback(state.write_task_done)
+
+        try:
+            await asyncio.shield(done)
         except asyncio.CancelledError as ex:
             raise TSmartCancelledError() from ex
 
+    async def _drain_writes(self) -> None:
+        """Send the newest pending write until no more writes are pending.
+
+        Every collapsed caller gets the result of its write, whatever it
+        raises, and fails with TSmartCancelledError if the drain stops early.
+        """
+
+        state = self.state
+        done: asyncio.Future[None] | None = None
+        try:
+            while state.pending_write is not None:
+                if self.write_debounce:
+                    await asyncio.sleep(self.write_debounce)
+
+                values = state.pending_write
+                done = state.pending_write_done
+                state.pending_write = None
+                state.pending_write_done = None
+                assert values is not None and done is not None
+
+                try:
+                    await self._control_write(*values)
+                except Exception as ex:  # pylint: disable=broad-except
+                    done.set_exception(ex)
+                else:
+                    done.set_result(None)
+                done = None
         finally:
-            transport.close()
-            sock.close()
+            if done is not None and not done.done():
+                done.set_exception(TSmartCancelledError())
+
+    async def _control_write(self, power: bool, mode: Mode, setpoint: int) -> None:
+        """Send a write to the immersion heater."""
+
+        _LOGGER.info("Control set %d %d %0.2f", power, mode, setpoint)
+
+        request = pack_control_write(power, mode, setpoint)
 
-        _LOGGER.info("Received control from %s" % self.ip_address)
+        _LOGGER.debug("Sending control message.")
+        await self._request(request, _unpack_control_write_response)
+
+        self.state.apply_write(power, mode, setpoint)
+
+        _LOGGER.info("Received control from %s", self.ip_address)
 
     async def __aenter__(self) -> Self:
         """Async enter.
 
+        Opens the UDP endpoint shared by all clients on the running loop.
+
         Returns
         -------
             The TSmartClient object.
         """
+        if self._endpoint is None:
+            self._endpoint = await self._acquire_endpoint(None)
         return self
 
     async def __aexit__(self, *_exc_info: object) -> None:
         """Async exit.
 
+        Releases the shared UDP endpoint, closing it when no client uses it.
+
         Args:
         ----
             _exc_info: Exec type.
         """
+        if self._endpoint is not None:
+            _release_endpoint(self._endpoint)
+            self._endpoint = None
@@ -2,23 +2,160 @@
 
 from __future__ import annotations
 
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
 
-def validate_checksum(data: bytes) -> bool:
+RTO_INITIAL = 0.5  # seconds
+RTO_MIN = 0.05  # seconds
+RTO_MAX = 2  # seconds
+
+
+def _xor_bytes(value: int) -> int:
+    """Return the XOR of the bytes of a non-negative integer.
+
+    Each step folds the integer onto itself shifted by twice the last step,
+    so every byte reaches the lowest byte exactly once in log2(n) steps.
+    """
+    value ^= value >> 128
+    value ^= value >> 64
+    value ^= value >> 32
+    value ^= value >> 16
+    value ^= value >> 8
+
+    shift = 256
+    while value >> shift:
+        value ^= value >> shift
+        shift <<= 1
+
+    return value & 0xFF
+
+
+def validate_checksum(data: bytes | bytearray | memoryview) -> bool:
     """Validate the checksum."""
 
-    t = 0
-    for b in data[:-1]:
-        t = t ^ b
-    return t ^ 0x55 == data[-1]
+    # Read big endian, so the checksum is the lowest byte
+    value = int.from_bytes(data, "big")
+    return _xor_bytes(value >> 8) ^ 0x55 == value & 0xFF
+
+
+def add_checksum_into(buffer: bytearray | memoryview) -> None:
+    """Set the checksum in the last byte of a writable buffer."""
+
+    buffer[-1] = _xor_bytes(int.from_bytes(buffer, "big") >> 8) ^ 0x55
 
 
 def add_checksum(data: bytes) -> bytearray:
     """Add a checksum."""
 
-    t = 0
     request = bytearray(data)
-    for b in request[:-1]:
-        t = t ^ b
-    request[-1] = t ^ 0x55
+    add_checksum_into(request)
 
     return request
+
+
+def import_numpy() -> Any:
+    """Return the NumPy module, or None if it is not installed."""
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    return numpy
+
+
+def validate_checksums_numpy(raw: Any) -> Any:
+    """Return a mask of the rows of a 2D uint8 NumPy array with a valid checksum."""
+    np = import_numpy()
+    width = raw.shape[1] - 1
+    words = width // 8
+
+    # XOR 8 bytes at a time, then fold each 64 bit word down to a byte
+    folded = np.zeros(len(raw), dtype=np.uint64)
+    if words and raw.strides[1] == 1:
+        for word in raw[:, : words * 8].view(np.uint64).T:
+            folded ^= word
+    else:
+        words = 0
+    for shift in (32, 16, 8):
+        folded ^= folded >> np.uint64(shift)
+    checksum = folded.astype(np.uint8)
+    for column in raw[:, words * 8 : width].T:
+        checksum ^= column
+
+    return checksum ^ 0x55 == raw[:, width]
+
+
+def validate_checksums(
+    frames: bytes | bytearray | memoryview | Sequence[bytes],
+    size: int | None = None,
+    use_numpy: bool | None = None,
+) -> list[bool]:
+    """Validate the checksums of many frames.
+
+    Takes a sequence of frames, or one buffer of back to back frames of
+    size bytes. With size, frames in a sequence of another length are
+    invalid. Frames of one length are checked in bulk with NumPy when it is
+    installed, unless use_numpy is False.
+    """
+
+    if isinstance(frames, (bytes, bytearray, memoryview)):
+        if not size or len(frames) % size:
+            raise ValueError(f"Buffer length is not a multiple of {size}")
+        buffer = memoryview(frames).cast("B")
+    elif size is None:
+        lengths = {len(frame) for frame in frames}
+        if len(lengths) != 1 or use_numpy is False:
+            return [validate_checksum(frame) for frame in frames]
+        (size,) = lengths
+        buffer = memoryview(b"".join(frames))
+    else:
+        sized = [len(frame) == size for frame in frames]
+        if not all(sized):
+            checked = iter(
+                validate_checksums(
+                    [frame for frame, ok in zip(frames, sized, strict=True) if ok],
+                    size,
+                    use_numpy,
+                )
+            )
+            return [ok and next(checked) for ok in sized]
+        buffer = memoryview(b"".join(frames))
+
+    np = import_numpy() if use_numpy is not False else None
+    if np is None:
+        if use_numpy:
+            raise ImportError("NumPy is not installed")
+        return [
+            validate_checksum(buffer[offset : offset + size])
+            for offset in range(0, len(buffer), size)
+        ]
+
+    raw = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, size)
+    valid: list[bool] = validate_checksums_numpy(raw).tolist()
+    return valid
+
+
+@dataclass
+class RttEstimator:
+    """Round trip time estimator driving the retransmit timer (RFC 6298)."""
+
+    srtt: float | None = None
+    rttvar: float = 0.0
+    rto: float = RTO_INITIAL
+
+    def update(self, rtt: float) -> None:
+        """Update the estimate with a measured round trip time."""
+
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+        self.rto = min(max(self.srtt + 4 * self.rttvar, RTO_MIN), RTO_MAX)
+
+    def backoff(self) -> None:
+        """Double the retransmit timeout after a lost request."""
+
+        self.rto = min(self.rto * 2, RTO_MAX)
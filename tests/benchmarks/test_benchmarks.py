@@ -0,0 +1,155 @@
+"""Micro-benchmarks of the TSmart hot paths.
+
+Skipped unless TSMART_BENCHMARK is set. Speed is gated on the ops/sec of
+each benchmark relative to a calibration loop timed in the same process,
+so the stored baselines carry across machines of similar architecture;
+absolute ops/sec are stored for reference only. With TSMART_BENCHMARK=1
+each benchmark fails if its relative speed drops more than
+TSMART_BENCHMARK_TOLERANCE (a fraction, 0.3 by default) below the stored
+baseline, or if it allocates more than the baseline.
+TSMART_BENCHMARK=update stores new baselines; regenerate them when moving
+to a different Python version or CPU architecture. Run with -s to see the
+measurements.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from dataclasses import asdict
+import json
+import os
+from pathlib import Path
+import timeit
+import tracemalloc
+from typing import Any
+
+import pytest
+
+from aiotsmart.discovery import _unpack_discovery_response
+from aiotsmart.models import Status
+from aiotsmart.tsmart import (
+    _unpack_configuration_response,
+    _unpack_control_read_response,
+    _unpack_control_write_response,
+)
+from aiotsmart.util import add_checksum, validate_checksum
+
+from ..test_discovery import ADDR, DATA as DISCOVERY_DATA
+from ..test_tsmart import (
+    CONFIGURATION_DATA,
+    CONFIGURATION_REQUEST,
+    CONTROL_READ_DATA,
+    CONTROL_READ_REQUEST,
+    CONTROL_WRITE_DATA,
+)
+
+MODE = os.environ.get("TSMART_BENCHMARK")
+TOLERANCE = float(os.environ.get("TSMART_BENCHMARK_TOLERANCE", "0.3"))
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+REPEAT = 5
+ALLOCATION_SLACK = 64  # bytes
+
+pytestmark = pytest.mark.skipif(not MODE, reason="Set TSMART_BENCHMARK to run")
+
+_CONFIGURATION_DATA = bytes(CONFIGURATION_DATA)
+_CONTROL_READ_DATA = bytes(CONTROL_READ_DATA)
+_CONTROL_WRITE_DATA = bytes(CONTROL_WRITE_DATA)
+_STATUS = _unpack_control_read_response(CONTROL_READ_REQUEST, _CONTROL_READ_DATA)
+_STATUS_FIELDS = asdict(_STATUS)
+
+BENCHMARKS: dict[str, Callable[[], Any]] = {
+    "validate_checksum": lambda: validate_checksum(_CONTROL_READ_DATA),
+    "add_checksum": lambda: add_checksum(_CONTROL_READ_DATA),
+    "unpack_configuration_response": lambda: _unpack_configuration_response(
+        CONFIGURATION_REQUEST, _CONFIGURATION_DATA
+    ),
+    "unpack_control_read_response": lambda: _unpack_control_read_response(
+        CONTROL_READ_REQUEST, _CONTROL_READ_DATA
+    ),
+    "unpack_control_write_response": lambda: _unpack_control_write_response(
+        b"", _CONTROL_WRITE_DATA
+    ),
+    "unpack_discovery_response": lambda: _unpack_discovery_response(
+        DISCOVERY_DATA, ADDR
+    ),
+    "status_construction": lambda: Status(**_STATUS_FIELDS),
+    "status_has_error": lambda: _STATUS.has_error,
+}
+
+
+def _calibration() -> int:
+    """Run a fixed pure Python workload to time the interpreter against."""
+    t = 0
+    for b in _CONTROL_READ_DATA:
+        t = t ^ b
+    return t
+
+
+def _ops_per_sec(function: Callable[[], Any]) -> float:
+    """Return the best ops/sec of a function."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return number / min(timer.repeat(repeat=REPEAT, number=number))
+
+
+def _measure(function: Callable[[], Any], calibration: float) -> dict[str, float]:
+    """Return the speed and the bytes allocated by one call of a function."""
+    ops_per_sec = _ops_per_sec(function)
+
+    tracemalloc.start()
+    try:
+        function()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(ops_per_sec),
+        "relative_speed": round(ops_per_sec / calibration, 4),
+        "alloc_bytes": peak - before,
+    }
+
+
+@pytest.fixture(name="calibration", scope="module")
+def calibration_fixture() -> float:
+    """Return the ops/sec of the calibration loop on this machine."""
+    return _ops_per_sec(_calibration)
+
+
+@pytest.fixture(name="baseline", scope="module")
+def baseline_fixture() -> Iterator[dict[str, dict[str, float]]]:
+    """Return the stored baselines, storing new ones after an update run."""
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    yield baseline
+    if MODE == "update":
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.mark.parametrize("name", BENCHMARKS)
+def test_benchmark(
+    name: str,
+    calibration: float,
+    baseline: dict[str, dict[str, float]],
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test a hot path has not regressed against its baseline."""
+    result = _measure(BENCHMARKS[name], calibration)
+    with capsys.disabled():
+        print(
+            f"\n{name}: {result['ops_per_sec']:,} ops/sec "
+            f"({result['relative_speed']}x calibration), "
+            f"{result['alloc_bytes']} bytes/call"
+        )
+
+    if MODE == "update":
+        baseline[name] = result
+        return
+
+    expected = baseline.get(name)
+    if expected is None:
+        pytest.skip(f"No baseline for {name}")
+    assert result["relative_speed"] >= expected["relative_speed"] * (1 - TOLERANCE)
+    assert result["alloc_bytes"] <= expected["alloc_bytes"] + ALLOCATION_SLACK
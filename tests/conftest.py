@@ -5,6 +5,7 @@ from typing import AsyncGenerator
 import pytest
 
 from aiotsmart import TSmartClient, TSmartDiscovery
+import aiotsmart.state
 from syrupy import SnapshotAssertion
 
 from .syrupy import TSmartSnapshotExtension
@@ -16,6 +17,13 @@ def snapshot_assertion(snapshot: SnapshotAssertion) -> SnapshotAssertion:
     return snapshot.use_extension(TSmartSnapshotExtension)
 
 
+@pytest.fixture(autouse=True)
+def clear_device_states() -> None:
+    """Start every test without shared device state."""
+    # pylint:disable=protected-access
+    aiotsmart.state._DEVICE_STATES.clear()
+
+
 @pytest.fixture(name="tsmart_client")
 async def client() -> AsyncGenerator[TSmartClient, None]:
     """Return a TSmart client."""
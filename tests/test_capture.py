@@ -0,0 +1,194 @@
+"""Test TSmart capture and replay."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+
+from aiotsmart.capture import (
+    CAPTURE_MAGIC,
+    INBOUND,
+    OUTBOUND,
+    RETRANSMIT,
+    CaptureReader,
+    CaptureWriter,
+    replay,
+)
+from aiotsmart.discovery import DiscoveryProtocol
+from aiotsmart.models import Status
+from aiotsmart.tsmart import TSmartClient, TsmartProtocol
+
+from .test_discovery import DATA as DISCOVERY_DATA
+from .test_tsmart import (
+    ADDR,
+    CONFIGURATION_DATA,
+    CONFIGURATION_REQUEST,
+    CONTROL_READ_DATA,
+    CONTROL_READ_REQUEST,
+)
+
+
+def test_capture_round_trip(tmp_path: Path) -> None:
+    """Test records read back as they were written."""
+    path = tmp_path / "tsmart.cap"
+    with CaptureWriter(path, buffer_size=64) as writer:
+        writer.sent(CONTROL_READ_REQUEST, ADDR)
+        writer.retransmitted(CONTROL_READ_REQUEST, ADDR)
+        writer.received(CONTROL_READ_DATA, ADDR)
+
+    with CaptureWriter(path) as writer:
+        writer.received(b"", ADDR)
+
+    assert path.read_bytes().startswith(CAPTURE_MAGIC)
+    with CaptureReader(path) as reader:
+        records = list(reader)
+
+    assert [record.direction for record in records] == [
+        OUTBOUND,
+        RETRANSMIT,
+        INBOUND,
+        INBOUND,
+    ]
+    assert records[0].addr == ADDR
+    assert records[2].data == CONTROL_READ_DATA
+    assert records[3].data == b""
+    assert records[0].timestamp <= records[3].timestamp
+
+
+def test_capture_truncated(tmp_path: Path) -> None:
+    """Test a record cut short ends the capture."""
+    path = tmp_path / "tsmart.cap"
+    with CaptureWriter(path) as writer:
+        writer.received(CONTROL_READ_DATA, ADDR)
+        writer.received(CONTROL_READ_DATA, ADDR)
+    path.write_bytes(path.read_bytes()[:-1])
+
+    with CaptureReader(path) as reader:
+        assert len(list(reader)) == 1
+
+
+def test_capture_reader_errors(tmp_path: Path) -> None:
+    """Test reading empty and foreign files."""
+    path = tmp_path / "empty.cap"
+    path.write_bytes(b"")
+    with CaptureReader(path) as reader:
+        assert not list(reader)
+
+    path.write_bytes(b"not a capture")
+    with pytest.raises(ValueError, match="not a TSmart capture"):
+        CaptureReader(path)
+
+
+async def test_client_capture(tmp_path: Path) -> None:
+    """Test a client records its requests and their responses."""
+    path = tmp_path / "tsmart.cap"
+    with CaptureWriter(path) as writer:
+        async with TSmartClient(ADDR[0], capture=writer) as client:
+            # pylint:disable=protected-access
+            assert client._endpoint
+            protocol = client._endpoint.protocol
+
+            def sendto(request: bytes, addr: tuple[str, int]) -> None:
+                asyncio.get_running_loop().call_soon(
+                    protocol.datagram_received, CONTROL_READ_DATA, addr
+                )
+
+            with patch.object(protocol, "transport", Mock(sendto=sendto)):
+                await client.control_read()
+
+    with CaptureReader(path) as reader:
+        records = list(reader)
+
+    assert [(record.direction, record.data) for record in records] == [
+        (OUTBOUND, CONTROL_READ_REQUEST),
+        (INBOUND, CONTROL_READ_DATA),
+    ]
+
+
+async def test_client_capture_other_clients(tmp_path: Path) -> None:
+    """Test a client does not record other clients on the shared endpoint."""
+    path = tmp_path / "tsmart.cap"
+    with CaptureWriter(path) as writer:
+        async with (
+            TSmartClient(ADDR[0], capture=writer) as client,
+            TSmartClient("192.168.1.2") as other,
+        ):
+            # pylint:disable=protected-access
+            assert client._endpoint
+            protocol = client._endpoint.protocol
+
+            def sendto(request: bytes, addr: tuple[str, int]) -> None:
+                asyncio.get_running_loop().call_soon(
+                    protocol.datagram_received, CONTROL_READ_DATA, addr
+                )
+
+            with patch.object(protocol, "transport", Mock(sendto=sendto)):
+                await asyncio.gather(other.control_read(), client.control_read())
+                await other.control_read()
+
+    with CaptureReader(path) as reader:
+        assert [record.addr for record in reader] == [ADDR, ADDR]
+
+
+async def test_replay_client_traffic(tmp_path: Path) -> None:
+    """Test replaying a capture decodes the responses as they were live."""
+    path = tmp_path / "tsmart.cap"
+    other = ("192.168.1.2", 1337)
+    with CaptureWriter(path) as writer:
+        writer.sent(CONFIGURATION_REQUEST, ADDR)
+        writer.sent(CONTROL_READ_REQUEST, ADDR)
+        writer.retransmitted(CONTROL_READ_REQUEST, ADDR)
+        writer.sent(CONTROL_READ_REQUEST, other)
+        writer.received(CONTROL_READ_DATA, ADDR)
+        writer.received(CONFIGURATION_DATA, ADDR)
+
+    protocol = TsmartProtocol()
+    received = Mock(wraps=protocol.datagram_received)
+    with patch.object(protocol, "datagram_received", received):
+        assert await replay(path, protocol) == 2
+
+    assert received.call_args_list[0].args == (CONTROL_READ_DATA, ADDR)
+    # The unanswered request to the other heater is dropped
+    # pylint:disable=protected-access
+    assert not protocol._pending
+
+
+async def test_replay_decodes(tmp_path: Path) -> None:
+    """Test replayed responses complete the futures of captured requests."""
+    path = tmp_path / "tsmart.cap"
+    with CaptureWriter(path) as writer:
+        writer.sent(CONTROL_READ_REQUEST, ADDR)
+        writer.received(CONTROL_READ_DATA, ADDR)
+
+    protocol = TsmartProtocol()
+    results: list[Status] = []
+    expect = protocol.expect
+
+    def record_expect(*args: object) -> asyncio.Future[Status]:
+        future = expect(*args)  # type: ignore[arg-type]
+        future.add_done_callback(lambda done: results.append(done.result()))
+        return future
+
+    with patch.object(protocol, "expect", record_expect):
+        await replay(path, protocol)
+    await asyncio.sleep(0)
+
+    assert len(results) == 1
+    assert results[0].temperature_high == 54
+
+
+async def test_replay_discovery(tmp_path: Path) -> None:
+    """Test replaying a capture through discovery."""
+    path = tmp_path / "tsmart.cap"
+    with CaptureWriter(path) as writer:
+        writer.sent(DISCOVERY_DATA[:4], ("255.255.255.255", 1337))
+        writer.received(DISCOVERY_DATA, ("192.168.1.35", 1337))
+
+    callback = Mock()
+    assert await replay(path, DiscoveryProtocol(callback), realtime=True) == 1
+
+    callback.assert_called_once()
+    assert callback.call_args.args[0].device_id == "9B2A0D"
@@ -0,0 +1,133 @@
+"""Test TSmart wire format."""
+
+import random
+import struct
+
+import pytest
+
+from aiotsmart.codec import (
+    CONFIGURATION_REQUEST,
+    CONFIGURATION_RESPONSE_STRUCT,
+    CONTROL_READ_REQUEST,
+    CONTROL_READ_RESPONSE_STRUCT,
+    DISCOVERY_REQUEST,
+    DISCOVERY_RESPONSE_STRUCT,
+    decode_configuration_batch,
+    decode_control_read_batch,
+    decode_string,
+    pack_control_write,
+)
+from aiotsmart.models import Mode
+from aiotsmart.tsmart import (
+    _unpack_configuration_response,
+    _unpack_control_read_response,
+)
+from aiotsmart.util import add_checksum, validate_checksum
+
+from .test_tsmart import CONFIGURATION_DATA
+
+
+def _control_read_frames(count: int) -> list[bytes]:
+    """Return random control read responses, some with a bad checksum."""
+    rng = random.Random(1)
+    frames = []
+    for index in range(count):
+        frame = bytearray(rng.randbytes(30))
+        frame[0] = 0xF1
+        frame[6] = rng.choice(list(Mode))
+        frames.append(bytes(add_checksum(frame) if index % 5 else frame))
+    return frames
+
+
+def test_request_frames() -> None:
+    """Test the prebuilt request frames."""
+    assert DISCOVERY_REQUEST == b"\x01\x00\x00\x54"
+    assert CONFIGURATION_REQUEST == b"!\x00\x00t"
+    assert CONTROL_READ_REQUEST == b"\xf1\x00\x00\xa4"
+    assert isinstance(CONTROL_READ_REQUEST, bytes)
+
+
+def test_response_sizes() -> None:
+    """Test the response structs match the frame sizes."""
+    assert DISCOVERY_RESPONSE_STRUCT.size == 43
+    assert CONFIGURATION_RESPONSE_STRUCT.size == 326
+    assert CONTROL_READ_RESPONSE_STRUCT.size == 30
+
+
+def test_pack_control_write() -> None:
+    """Test packing a control write."""
+    expected = add_checksum(struct.pack("=BBBBHBB", 0xF2, 0, 0, 1, 450, Mode.ECO, 0))
+    assert pack_control_write(True, Mode.ECO, 45) == expected
+
+
+def test_decode_string() -> None:
+    """Test decoding a NUL padded string."""
+    assert decode_string(b"TESLA\x00\x00\xff") == "TESLA"
+    assert decode_string(b"") == ""
+
+
+@pytest.mark.parametrize("use_numpy", [None, False])
+def test_decode_control_read_batch(use_numpy: bool | None) -> None:
+    """Test batch decoding matches decoding one frame at a time."""
+    frames = _control_read_frames(50)
+    batch = decode_control_read_batch(b"".join(frames), use_numpy=use_numpy)
+
+    for index, frame in enumerate(frames):
+        assert bool(batch["valid"][index]) == validate_checksum(frame)
+        if not batch["valid"][index]:
+            continue
+        status = _unpack_control_read_response(CONTROL_READ_REQUEST, frame)
+        for name in (
+            "power",
+            "setpoint",
+            "temperature_high",
+            "temperature_low",
+            "temperature_average",
+            "relay",
+            "error_e01",
+            "error_w03",
+            "error_e05",
+        ):
+            assert batch[name][index] == getattr(status, name), name
+        assert Mode(batch["mode"][index]) == status.mode
+
+
+@pytest.mark.parametrize("use_numpy", [None, False])
+def test_decode_control_read_batch_invalid(use_numpy: bool | None) -> None:
+    """Test the valid column of a batch."""
+    good = _control_read_frames(2)[1]
+    other = bytes(add_checksum(b"\xf2" + good[1:]))
+    frames = [good, good[:-1], other, good[:-1] + b"\x00", good]
+
+    batch = decode_control_read_batch(frames, use_numpy=use_numpy)
+    assert [bool(valid) for valid in batch["valid"]] == [
+        True,
+        False,
+        False,
+        False,
+        True,
+    ]
+
+
+def test_decode_control_read_batch_buffer_length() -> None:
+    """Test a buffer must hold whole frames."""
+    with pytest.raises(ValueError, match="multiple of 30"):
+        decode_control_read_batch(bytes(31))
+
+
+@pytest.mark.parametrize("use_numpy", [None, False])
+def test_decode_configuration_batch(use_numpy: bool | None) -> None:
+    """Test batch decoding configuration responses."""
+    configuration = _unpack_configuration_response(
+        CONFIGURATION_REQUEST, CONFIGURATION_DATA
+    )
+    bad = bytes(CONFIGURATION_DATA[:-1]) + b"\x00"
+
+    batch = decode_configuration_batch(
+        [bytes(CONFIGURATION_DATA), bad, b"!"], use_numpy=use_numpy
+    )
+    assert batch["valid"] == [True, False, False]
+    assert batch["device_id"] == [configuration.device_id, None, None]
+    assert batch["device_name"] == [configuration.device_name, None, None]
+    assert batch["firmware_version"][0] == configuration.firmware_version
+    assert batch["firmware_name"][0] == configuration.firmware_name
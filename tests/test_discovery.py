@@ -2,12 +2,20 @@
 
 from __future__ import annotations
 
+import asyncio
+import ipaddress
 from typing import TYPE_CHECKING
 from unittest.mock import AsyncMock, Mock, patch
 
+import pytest
+
 import aiotsmart
-from aiotsmart.discovery import TSmartDiscovery
+from aiotsmart.codec import COMMAND_DISCOVERY
+from aiotsmart.discovery import DiscoveryService, TSmartDiscovery
+from aiotsmart.metrics import TSmartMetrics
 from aiotsmart.models import DiscoveredDevice
+from aiotsmart.simulator import HeaterSimulator
+from aiotsmart.tsmart import TSmartClient
 
 if TYPE_CHECKING:
     from syrupy import SnapshotAssertion
@@ -77,3 +85,196 @@ async def test_discovery_protocol_with_callable() -> None:
         ip_address="192.168.1.35", device_id="9B2A0D", device_name="TESLA"
     )
     assert result == expected
+
+
+async def test_discovery_service_registry() -> None:
+    """Test the service tracks heaters appearing and disappearing."""
+    appeared = Mock()
+    disappeared = AsyncMock()
+    service = DiscoveryService(
+        interval=10, on_appeared=appeared, on_disappeared=disappeared
+    )
+    device = DiscoveredDevice("192.168.1.35", "9B2A0D", "TESLA")
+    moved = DiscoveredDevice("192.168.1.36", "9B2A0D", "TESLA")
+
+    # pylint:disable=protected-access
+    with patch("aiotsmart.registry.time.monotonic", return_value=100):
+        service._device_seen(device)
+    with patch("aiotsmart.registry.time.monotonic", return_value=120):
+        service._device_seen(moved)
+        service._expire()
+
+    appeared.assert_called_once_with(device)
+    seen = service.registry.seen("9B2A0D")
+    assert seen
+    assert (seen.first_seen, seen.last_seen) == (100, 120)
+    assert service.devices == [moved]
+
+    with patch("aiotsmart.registry.time.monotonic", return_value=150):
+        service._expire()
+    assert service.devices == [moved]
+
+    with patch("aiotsmart.registry.time.monotonic", return_value=151):
+        service._expire()
+    assert not service.devices
+    disappeared.assert_called_once_with(moved)
+
+
+async def test_discovery_service() -> None:
+    """Test the service discovers simulated heaters and notices one leave."""
+    simulator = HeaterSimulator.create(2, host="127.0.4.1", port=1337, broadcast=True)
+    try:
+        await simulator.start()
+    except OSError:
+        pytest.skip("Broadcast is not available")
+
+    appeared = asyncio.Event()
+    disappeared: list[DiscoveredDevice] = []
+
+    def on_appeared(_device: DiscoveredDevice) -> None:
+        if len(service.registry) == len(simulator.heaters):
+            appeared.set()
+
+    service = DiscoveryService(
+        interval=0.1,
+        expire_after=0.25,
+        on_appeared=on_appeared,
+        on_disappeared=disappeared.append,
+    )
+    try:
+        with patch("aiotsmart.discovery.DISCOVERY_INTERVAL", 0.1):
+            async with service:
+                await asyncio.wait_for(appeared.wait(), 1)
+                assert (
+                    sorted(service.devices, key=lambda device: device.device_id)
+                    == simulator.devices
+                )
+
+                simulator.heaters[0].silent = True
+                async with asyncio.timeout(2):
+                    while not disappeared:
+                        await asyncio.sleep(0.05)
+                assert disappeared == [simulator.devices[0]]
+                assert service.devices == [simulator.devices[1]]
+    finally:
+        simulator.close()
+
+
+async def test_discovery_service_with_client() -> None:
+    """Test a running service leaves the replies of open clients alone."""
+    simulator = HeaterSimulator.create(1, host="127.0.14.1", port=1337, broadcast=True)
+    try:
+        await simulator.start()
+    except OSError:
+        pytest.skip("Broadcast is not available")
+
+    appeared = asyncio.Event()
+    service = DiscoveryService(interval=0.1, on_appeared=lambda _: appeared.set())
+    try:
+        async with TSmartClient("127.0.14.1", timeout=0.5) as client:
+            await client.control_read()
+            async with service:
+                for _ in range(3):
+                    await client.control_read()
+                await asyncio.wait_for(appeared.wait(), 1)
+            await client.control_read()
+    finally:
+        simulator.close()
+
+    assert service.devices == simulator.devices
+
+
+def test_sweep_hosts() -> None:
+    """Test sweep ranges expand to their hosts once each."""
+    # pylint:disable=protected-access
+    hosts = aiotsmart.discovery._sweep_hosts(["10.0.0.0/30", "10.0.0.1/31"])
+    assert hosts == ["10.0.0.1", "10.0.0.2", "10.0.0.0"]
+    assert len(aiotsmart.discovery._sweep_hosts(["192.168.4.0/22"])) == 1022
+
+
+async def test_sweep() -> None:
+    """Test a unicast sweep finds simulated heaters without broadcast."""
+    simulator = HeaterSimulator.create(5, host="127.0.6.1", port=1337)
+    await simulator.start()
+    metrics = TSmartMetrics()
+    discovery = TSmartDiscovery(metrics=metrics)
+    loop = asyncio.get_running_loop()
+
+    try:
+        start = loop.time()
+        devices = await discovery.sweep(["127.0.6.0/24"], rate=1000, wait=0.2)
+        elapsed = loop.time() - start
+    finally:
+        simulator.close()
+
+    assert sorted(devices, key=lambda device: device.device_id) == simulator.devices
+    assert metrics.requests[COMMAND_DISCOVERY] == 254
+    assert metrics.discovery_responses == 5
+    # 254 probes at 1000 per second
+    assert elapsed >= 0.25 + 0.2 - 0.02
+
+
+async def test_discovery_with_client() -> None:
+    """Test discovery and a client share the heater port without losing replies."""
+    simulator = HeaterSimulator.create(1, host="127.0.13.1", port=1337)
+    await simulator.start()
+
+    try:
+        async with TSmartClient("127.0.13.1", timeout=0.5) as client:
+            with patch("aiotsmart.discovery.DISCOVERY_INTERVAL", 0.3):
+                discovery = asyncio.create_task(TSmartDiscovery().discover())
+                await asyncio.sleep(0.05)
+                assert not discovery.done()
+                await client.control_read()
+                await discovery
+            await client.control_read()
+    finally:
+        simulator.close()
+
+
+def test_broadcast_targets() -> None:
+    """Test discovery broadcasts on every interface given."""
+    # pylint:disable=protected-access
+    targets = aiotsmart.discovery._broadcast_targets(
+        ["192.168.1.10/24", "10.0.0.5/255.255.0.0", "192.168.1.11/24"]
+    )
+    assert targets == [
+        ("255.255.255.255", 1337),
+        ("192.168.1.255", 1337),
+        ("10.0.255.255", 1337),
+    ]
+
+
+def test_local_broadcast_addresses() -> None:
+    """Test local interfaces give directed broadcast addresses."""
+    # pylint:disable=protected-access
+    for address in aiotsmart.discovery._local_broadcast_addresses():
+        broadcast = ipaddress.IPv4Address(address)
+        assert not broadcast.is_loopback
+        assert not broadcast.is_unspecified
+
+
+async def test_discovery_interfaces() -> None:
+    """Test each round broadcasts on every interface and merges responses."""
+    capture = Mock()
+    discovery = TSmartDiscovery(
+        interfaces=["127.0.9.1/24", "127.0.10.1/24"], capture=capture
+    )
+
+    with patch("aiotsmart.discovery.DISCOVERY_INTERVAL", 0.01):
+        await discovery.discover()
+
+    sent = [call.args[1] for call in capture.sent.call_args_list]
+    assert (
+        sent
+        == [("255.255.255.255", 1337), ("127.0.9.255", 1337), ("127.0.10.255", 1337)]
+        * 2
+    )
+
+    # The same heater answering on two segments is kept once
+    protocol = aiotsmart.discovery.DiscoveryProtocol(discovery.registry.add)
+    protocol.datagram_received(DATA, ("127.0.9.7", 1337))
+    protocol.datagram_received(DATA, ("127.0.9.7", 1337))
+    assert discovery.registry.devices == [
+        DiscoveredDevice("127.0.9.7", "9B2A0D", "TESLA")
+    ]
@@ -0,0 +1,77 @@
+"""Test TSmart fleet."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import Mock, patch
+
+from aiotsmart.exceptions import TSmartBadResponseError, TSmartTimeoutError
+from aiotsmart.fleet import TSmartFleet
+from aiotsmart.models import DiscoveredDevice, Status
+
+from .test_tsmart import BAD_CONTROL_READ_DATA, CONTROL_READ_DATA
+
+DEVICES = [
+    DiscoveredDevice("192.0.2.1", "000001", "Good"),
+    DiscoveredDevice("192.0.2.2", "000002", "Bad"),
+    DiscoveredDevice("192.0.2.3", "000003", "Silent"),
+]
+
+
+async def test_fleet_control_read() -> None:
+    """Test reading a fleet returns per device results and errors."""
+    responses = {"192.0.2.1": CONTROL_READ_DATA, "192.0.2.2": BAD_CONTROL_READ_DATA}
+    in_flight = 0
+    peak = 0
+
+    async with TSmartFleet(DEVICES, concurrency=2, timeout=0.05, retries=0) as fleet:
+        # pylint:disable=protected-access
+        endpoint = fleet._clients["000001"]._endpoint
+        assert endpoint
+        protocol = endpoint.protocol
+
+        def respond(data: bytes, addr: tuple[str, int]) -> None:
+            nonlocal in_flight
+            in_flight -= 1
+            protocol.datagram_received(data, addr)
+
+        def sendto(_request: bytes, addr: tuple[str, int]) -> None:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            if addr[0] in responses:
+                asyncio.get_running_loop().call_later(
+                    0.01, respond, responses[addr[0]], addr
+                )
+
+        with patch.object(protocol, "transport", Mock(sendto=sendto)):
+            results = await fleet.control_read()
+
+    assert list(results) == ["000001", "000002", "000003"]
+    assert isinstance(results["000001"], Status)
+    assert isinstance(results["000002"], TSmartBadResponseError)
+    assert isinstance(results["000003"], TSmartTimeoutError)
+    assert peak == 2
+
+
+async def test_fleet_without_context_manager() -> None:
+    """Test a fleet opens the shared endpoint for a single sweep."""
+    fleet = TSmartFleet(DEVICES[:1], timeout=0.01, retries=0)
+
+    results = await fleet.configuration_read()
+
+    assert isinstance(results["000001"], TSmartTimeoutError)
+    # pylint:disable=protected-access
+    assert not fleet._entered
+
+
+async def test_fleet_control_read_max_age() -> None:
+    """Test a fleet read skips heaters with a fresh cached status."""
+    fleet = TSmartFleet(DEVICES[:1], timeout=0.01, retries=0)
+    # pylint:disable=protected-access
+    status = Mock()
+    fleet._clients["000001"].state.set_status(status)
+
+    results = await fleet.control_read(max_age=10)
+
+    assert results["000001"] is status
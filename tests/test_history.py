@@ -0,0 +1,115 @@
+"""Test TSmart status history."""
+
+from __future__ import annotations
+
+from dataclasses import replace
+
+import pytest
+
+from aiotsmart.history import (
+    ERROR_BITS,
+    FLAG_POWER,
+    FLAG_RELAY,
+    HistoryStore,
+    StatusHistory,
+)
+from aiotsmart.models import Mode, Status
+
+STATUS = Status(
+    power=True,
+    setpoint=50,
+    mode=Mode.ECO,
+    temperature_high=54,
+    temperature_low=-3,
+    temperature_average=25,
+    relay=True,
+    error_e01=False,
+    error_e02=True,
+    error_e03=False,
+    error_e04=False,
+    error_e05=False,
+    error_w01=False,
+    error_w02=False,
+    error_w03=True,
+    raw_response=b"",
+)
+
+
+def test_history_append() -> None:
+    """Test appending decodes a status into the columns."""
+    history = StatusHistory(4)
+    assert len(history) == 0
+    assert not history.window()["time"]
+
+    history.append(STATUS, timestamp=1000.5)
+    # The same status object is only recorded once
+    history.append(STATUS, timestamp=1010)
+
+    window = history.window()
+    assert len(history) == 1
+    assert window["time"].tolist() == [1000]
+    assert window["temperature_high"].tolist() == [54]
+    assert window["temperature_low"].tolist() == [-3]
+    assert window["setpoint"].tolist() == [50]
+    assert window["mode"].tolist() == [Mode.ECO]
+    assert window["flags"].tolist() == [FLAG_POWER | FLAG_RELAY]
+    assert window["errors"].tolist() == [
+        ERROR_BITS["error_e02"] | ERROR_BITS["error_w03"]
+    ]
+
+
+def test_history_ring() -> None:
+    """Test a full history overwrites the oldest samples."""
+    history = StatusHistory(3)
+    for second in range(5):
+        history.append(replace(STATUS, setpoint=second), timestamp=second * 10)
+
+    assert len(history) == 3
+    window = history.window()
+    assert window["time"].tolist() == [20, 30, 40]
+    assert window["setpoint"].tolist() == [2, 3, 4]
+
+
+def test_history_window() -> None:
+    """Test slicing a time range, including across the wrap point."""
+    history = StatusHistory(5)
+    for second in range(7):
+        history.append(replace(STATUS), timestamp=second * 10)
+
+    assert history.window(25)["time"].tolist() == [30, 40, 50, 60]
+    assert history.window(30, 50)["time"].tolist() == [30, 40]
+    assert history.window(end=40)["time"].tolist() == [20, 30]
+    assert not history.window(70)["time"]
+    assert not history.window(45, 45)["time"]
+
+
+def test_history_window_numpy() -> None:
+    """Test the window as NumPy arrays."""
+    np = pytest.importorskip("numpy")
+
+    history = StatusHistory(2)
+    history.append(STATUS, timestamp=10)
+    history.append(replace(STATUS, temperature_high=60), timestamp=20)
+
+    window = history.window_numpy()
+    assert window["time"].dtype == np.uint32
+    assert window["temperature_high"].tolist() == [54, 60]
+    assert window["temperature_low"].dtype == np.int16
+
+
+def test_history_capacity() -> None:
+    """Test the capacity must be positive."""
+    with pytest.raises(ValueError, match="capacity"):
+        StatusHistory(0)
+
+
+def test_history_store() -> None:
+    """Test a store keeps a history per heater."""
+    store = HistoryStore(10)
+    store.record("192.168.1.1", STATUS, timestamp=1)
+    store.record("192.168.1.1", replace(STATUS), timestamp=2)
+    store.record("192.168.1.2", STATUS, timestamp=3)
+
+    assert "192.168.1.1" in store
+    assert len(store["192.168.1.1"]) == 2
+    assert len(store["192.168.1.2"]) == 1
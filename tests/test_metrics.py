@@ -0,0 +1,111 @@
+"""Test TSmart request metrics."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from aiotsmart.discovery import DiscoveryProtocol
+from aiotsmart.exceptions import TSmartChecksumError, TSmartTimeoutError
+from aiotsmart.metrics import LATENCY_BUCKETS, LatencyHistogram, TSmartMetrics
+from aiotsmart.simulator import HeaterSimulator, SimulatedHeater
+from aiotsmart.tsmart import TSmartClient
+
+from .test_discovery import ADDR as DISCOVERY_ADDR, BAD_DATA, DATA
+from .test_tsmart import ADDR, BAD_CONTROL_READ_DATA
+
+
+def test_latency_histogram() -> None:
+    """Test latencies fall into their buckets."""
+    histogram = LatencyHistogram()
+    assert histogram.mean is None
+
+    for latency in (0.001, 0.005, 0.03, 10):
+        histogram.observe(latency)
+
+    assert histogram.counts[0] == 2
+    assert histogram.counts[LATENCY_BUCKETS.index(0.05)] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.count == 4
+    assert histogram.maximum == 10
+    assert histogram.snapshot()["buckets"]["+Inf"] == 1
+
+
+async def test_client_metrics() -> None:
+    """Test requests are counted with their outcome and latency."""
+    metrics = TSmartMetrics()
+    heaters = [SimulatedHeater(), SimulatedHeater(silent=True)]
+    async with HeaterSimulator(heaters) as simulator:
+        good, silent = simulator.heaters
+        client = TSmartClient(
+            good.ip_address, local_port=0, port=good.port, metrics=metrics
+        )
+        await client.configuration_read()
+        await client.control_read()
+
+        client = TSmartClient(
+            silent.ip_address,
+            local_port=0,
+            port=silent.port,
+            timeout=0.8,
+            retries=1,
+            metrics=metrics,
+        )
+        with pytest.raises(TSmartTimeoutError):
+            await client.control_read()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["requests"] == {"configuration": 1, "control_read": 2}
+    assert snapshot["in_flight"] == 0
+    assert snapshot["in_flight_peak"] == 1
+    assert snapshot["timeouts"] == 1
+
+    device = snapshot["devices"][f"127.0.0.1:{good.port}"]
+    assert device["requests"] == 2
+    assert device["latency"]["count"] == 2
+    device = snapshot["devices"][f"127.0.0.1:{silent.port}"]
+    assert device["timeouts"] == 1
+    assert device["retransmits"] == 1
+    assert device["attempts"] == {"2": 1}
+    assert device["latency"]["count"] == 0
+    json.dumps(snapshot)
+
+
+async def test_client_metrics_checksum_failure() -> None:
+    """Test a response failing its checksum is counted."""
+    metrics = TSmartMetrics()
+    async with TSmartClient(ADDR[0], metrics=metrics) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+
+        def sendto(request: bytes, addr: tuple[str, int]) -> None:
+            asyncio.get_running_loop().call_soon(
+                protocol.datagram_received, BAD_CONTROL_READ_DATA, addr
+            )
+
+        with (
+            patch.object(protocol, "transport", Mock(sendto=sendto)),
+            pytest.raises(TSmartChecksumError),
+        ):
+            await client.control_read()
+
+    device = metrics.devices[ADDR[0]]
+    assert device.bad_responses == 1
+    assert device.checksum_failures == 1
+    assert metrics.in_flight == 0
+
+
+def test_discovery_metrics() -> None:
+    """Test discovery responses are counted."""
+    metrics = TSmartMetrics()
+    protocol = DiscoveryProtocol(Mock(), metrics=metrics)
+    protocol.datagram_received(DATA, DISCOVERY_ADDR)
+    protocol.datagram_received(BAD_DATA, DISCOVERY_ADDR)
+    protocol.datagram_received(DATA[:4], DISCOVERY_ADDR)
+
+    assert metrics.discovery_responses == 1
+    assert metrics.discovery_rejected == 1
@@ -1,6 +1,24 @@
 """Test TSmart models."""
 
-from aiotsmart.models import Mode, DiscoveredDevice, Configuration, Status
+from dataclasses import replace
+
+import aiotsmart.tsmart
+from aiotsmart.models import (
+    CompactConfiguration,
+    CompactStatus,
+    Configuration,
+    DiscoveredDevice,
+    Mode,
+    Status,
+)
+from aiotsmart.util import validate_checksum
+
+from .test_tsmart import (
+    CONFIGURATION_DATA,
+    CONFIGURATION_REQUEST,
+    CONTROL_READ_DATA,
+    CONTROL_READ_REQUEST,
+)
 
 
 def test_mode_enum_values() -> None:
@@ -144,3 +162,73 @@ def test_status_with_all_errors() -> None:
     )
 
     assert status.has_error is True
+
+
+def test_compact_status() -> None:
+    """Test CompactStatus decodes lazily and equals the Status."""
+    # pylint:disable=protected-access
+    status = aiotsmart.tsmart._unpack_control_read_response(
+        CONTROL_READ_REQUEST, CONTROL_READ_DATA
+    )
+    compact = CompactStatus.from_status(status)
+
+    assert not hasattr(compact, "__dict__")
+    assert compact._fields is None
+    assert compact.temperature_high == 54
+    assert compact._fields is not None
+
+    assert compact == status
+    assert status == compact
+    assert compact == CompactStatus(CONTROL_READ_DATA)
+    assert compact.to_status() == status
+    assert compact != replace(status, setpoint=20)
+    assert compact != "status"
+
+    for name in (
+        "power",
+        "setpoint",
+        "mode",
+        "temperature_low",
+        "temperature_average",
+        "relay",
+        "error_e01",
+        "error_e02",
+        "error_e03",
+        "error_e04",
+        "error_e05",
+        "error_w01",
+        "error_w02",
+        "error_w03",
+        "has_error",
+    ):
+        assert getattr(compact, name) == getattr(status, name)
+
+    assert repr(compact).startswith("CompactStatus(power=False")
+
+
+def test_compact_configuration() -> None:
+    """Test CompactConfiguration decodes lazily and can be redacted."""
+    # pylint:disable=protected-access
+    configuration = aiotsmart.tsmart._unpack_configuration_response(
+        CONFIGURATION_REQUEST, CONFIGURATION_DATA
+    )
+    compact = CompactConfiguration.from_configuration(configuration)
+
+    assert not hasattr(compact, "__dict__")
+    assert compact == configuration
+    assert configuration == compact
+    assert compact.device_id == "9B2A0D"
+    assert compact.device_name == "TESLA"
+    assert compact.firmware_version == "1.9.96"
+    assert compact.firmware_name == "Boiler"
+    assert compact != "configuration"
+    assert repr(compact).startswith("CompactConfiguration(device_id='9B2A0D'")
+
+    redacted = CompactConfiguration(CONFIGURATION_DATA, redact=True)
+    assert b"abcdefghijkl" not in redacted.raw_response
+    assert validate_checksum(redacted.raw_response)
+    assert redacted.device_name == "TESLA"
+    assert redacted != compact
+    assert redacted == CompactConfiguration.from_configuration(
+        configuration, redact=True
+    )
@@ -0,0 +1,229 @@
+"""Test the TSmart device registry."""
+
+from __future__ import annotations
+
+import base64
+import json
+from pathlib import Path
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from aiotsmart.codec import (
+    WIFI_OFFSET,
+    WIFI_SIZE,
+    decode_configuration,
+    pack_configuration_response,
+)
+from aiotsmart.discovery import TSmartDiscovery
+from aiotsmart.models import Configuration, DiscoveredDevice
+from aiotsmart.registry import SHARED_REGISTRY, DeviceRegistry
+from aiotsmart.simulator import HeaterSimulator
+import aiotsmart.state
+from aiotsmart.state import find_device_state, get_device_state
+from aiotsmart.util import add_checksum
+
+DEVICE = DiscoveredDevice("192.168.1.35", "9B2A0D", "TESLA")
+MOVED = DiscoveredDevice("192.168.1.36", "9B2A0D", "TESLA")
+OTHER = DiscoveredDevice("192.168.1.35", "100001", "SIM_0001")
+
+
+def test_registry_lookup() -> None:
+    """Test heaters are found by device_id and IP address."""
+    registry = DeviceRegistry()
+    assert registry.add(DEVICE, now=1)
+    assert not registry.add(DEVICE, now=2)
+
+    assert registry.get("9B2A0D") == DEVICE
+    assert registry.get_by_ip("192.168.1.35") == DEVICE
+    assert registry.get("100001") is None
+    assert registry.get_by_ip("192.168.1.36") is None
+    assert "9B2A0D" in registry
+    assert list(registry) == [DEVICE]
+    seen = registry.seen("9B2A0D")
+    assert seen
+    assert (seen.first_seen, seen.last_seen) == (1, 2)
+
+
+def test_registry_ip_change() -> None:
+    """Test a heater moving address keeps a single entry."""
+    registry = DeviceRegistry()
+    registry.add(DEVICE, now=1)
+    assert not registry.add(MOVED, now=2)
+
+    assert registry.devices == [MOVED]
+    assert registry.get_by_ip("192.168.1.35") is None
+    assert registry.get_by_ip("192.168.1.36") == MOVED
+
+
+def test_registry_address_reused() -> None:
+    """Test a heater answering from another heater's address replaces it."""
+    registry = DeviceRegistry()
+    registry.add(DEVICE, now=1)
+    assert registry.add(OTHER, now=2)
+
+    assert registry.devices == [OTHER]
+    assert registry.get("9B2A0D") is None
+
+
+def test_registry_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test heaters not seen within the ttl are evicted."""
+    registry = DeviceRegistry(ttl=10)
+    registry.add(DEVICE, now=100)
+    registry.add(DiscoveredDevice("192.168.1.37", "100001", "SIM_0001"), now=105)
+
+    monkeypatch.setattr("aiotsmart.registry.time.monotonic", lambda: 110)
+    assert len(registry) == 2
+    monkeypatch.setattr("aiotsmart.registry.time.monotonic", lambda: 111)
+    assert [device.device_id for device in registry] == ["100001"]
+    assert registry.get_by_ip("192.168.1.35") is None
+
+    assert [seen.device.device_id for seen in registry.evict(ttl=1)] == ["100001"]
+    assert not registry.devices
+
+
+def test_registry_client() -> None:
+    """Test getting a client for a registered heater."""
+    registry = DeviceRegistry()
+    registry.add(DEVICE)
+
+    client = registry.client("9B2A0D", timeout=1)
+    assert client.ip_address == "192.168.1.35"
+    assert client.timeout == 1
+    with pytest.raises(KeyError):
+        registry.client("100001")
+
+
+def test_registry_scope() -> None:
+    """Test discovery instances share a registry only when given one."""
+    assert TSmartDiscovery().registry is not TSmartDiscovery().registry
+    assert (
+        TSmartDiscovery(registry=SHARED_REGISTRY).registry
+        is TSmartDiscovery(registry=SHARED_REGISTRY).registry
+    )
+
+
+def _configuration_with_wifi() -> Configuration:
+    """Return a configuration whose frame holds Wi-Fi credentials."""
+    frame = bytearray(
+        pack_configuration_response(0x9B2A0D, "TESLA", (1, 9, 96), "Boiler")
+    )
+    frame[WIFI_OFFSET : WIFI_OFFSET + 11] = b"ssid\x00secret"
+    raw = bytes(add_checksum(frame))
+    return Configuration(*decode_configuration(raw), raw_response=raw)
+
+
+def test_registry_save_load(tmp_path: Path) -> None:
+    """Test the registry is restored from its file with its configurations."""
+    path = tmp_path / "devices.json"
+    registry = DeviceRegistry()
+    registry.add(DEVICE)
+    registry.add(DiscoveredDevice("192.168.1.37", "100001", "SIM_0001"))
+    configuration = _configuration_with_wifi()
+    get_device_state(("192.168.1.35", 1337)).set_configuration(configuration)
+    registry.save(path)
+
+    text = path.read_text(encoding="utf-8")
+    assert " " not in text
+    saved = json.loads(text)["devices"]
+    assert saved[1][4] is None
+    raw = base64.b64decode(saved[0][4])
+    assert raw[WIFI_OFFSET : WIFI_OFFSET + WIFI_SIZE] == bytes(WIFI_SIZE)
+
+    # pylint:disable=protected-access
+    aiotsmart.state._DEVICE_STATES.clear()
+    restored = DeviceRegistry()
+    assert restored.load(path) == registry.devices
+    assert restored.devices == registry.devices
+    seen = restored.seen("9B2A0D")
+    original = registry.seen("9B2A0D")
+    assert seen
+    assert original
+    assert seen.last_seen == pytest.approx(original.last_seen, abs=0.01)
+
+    state = find_device_state(("192.168.1.35", 1337))
+    assert state
+    assert state.configuration
+    assert state.configuration.device_id == configuration.device_id
+    assert state.configuration.firmware_version == configuration.firmware_version
+    assert find_device_state(("192.168.1.37", 1337)) is None
+
+
+def test_registry_load_configuration_age(tmp_path: Path) -> None:
+    """Test a loaded configuration is as old as its heater's last sighting."""
+    path = tmp_path / "devices.json"
+    registry = DeviceRegistry()
+    registry.add(DEVICE, now=time.monotonic() - 86400)
+    get_device_state(("192.168.1.35", 1337)).set_configuration(
+        _configuration_with_wifi()
+    )
+    registry.save(path)
+
+    # pylint:disable=protected-access
+    aiotsmart.state._DEVICE_STATES.clear()
+    DeviceRegistry().load(path)
+
+    state = find_device_state(("192.168.1.35", 1337))
+    assert state
+    assert state.cached_configuration(3600) is None
+    assert state.cached_configuration(2 * 86400)
+
+
+def test_registry_load_invalid(tmp_path: Path) -> None:
+    """Test a missing or unreadable file loads nothing."""
+    registry = DeviceRegistry()
+    assert registry.load(tmp_path / "missing.json") == []
+
+    path = tmp_path / "devices.json"
+    path.write_text('{"version":1,"devices":[["192.168.1.35"]]}', encoding="utf-8")
+    assert registry.load(path) == []
+    path.write_text('{"version":2,"devices":[]}', encoding="utf-8")
+    assert registry.load(path) == []
+    assert not registry.devices
+
+
+async def test_warm_start(tmp_path: Path) -> None:
+    """Test a warm start returns saved heaters and rediscovers lost ones."""
+    path = tmp_path / "devices.json"
+    simulator = HeaterSimulator.create(3, host="127.0.12.1", port=1337)
+    lost = DiscoveredDevice("127.0.12.9", "DEAD01", "GONE")
+    registry = DeviceRegistry()
+    for device in [*simulator.devices, lost]:
+        registry.add(device)
+    registry.save(path)
+
+    discovery = TSmartDiscovery()
+    async with simulator:
+        with (
+            patch("aiotsmart.discovery.VALIDATION_TIMEOUT", 0.3),
+            patch.object(
+                discovery, "discover", AsyncMock(return_value=simulator.devices)
+            ),
+        ):
+            assert discovery.warm_start(path) == [*simulator.devices, lost]
+            assert discovery.validation
+            await discovery.validation
+            discovery.discover.assert_awaited_once()  # type: ignore[attr-defined]
+
+        assert discovery.registry.devices == simulator.devices
+        for heater in simulator.heaters:
+            assert heater.requests == 1
+
+        # Every saved heater answers, so there is no rediscovery
+        discovery.registry.save(path)
+        discovery = TSmartDiscovery()
+        with patch.object(discovery, "discover", AsyncMock()):
+            assert discovery.warm_start(path) == simulator.devices
+            assert discovery.validation
+            assert await discovery.validation == simulator.devices
+            discovery.discover.assert_not_awaited()  # type: ignore[attr-defined]
+
+
+async def test_warm_start_without_file(tmp_path: Path) -> None:
+    """Test a warm start with nothing saved discovers in the background."""
+    async with TSmartDiscovery() as discovery:
+        with patch.object(discovery, "discover", AsyncMock(return_value=[DEVICE])):
+            assert discovery.warm_start(tmp_path / "devices.json") == []
+            assert discovery.validation
+            assert await discovery.validation == [DEVICE]
@@ -0,0 +1,117 @@
+"""Test TSmart clients against simulated heaters."""
+
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import pytest
+
+from aiotsmart import TSmartClient, TSmartDiscovery, TSmartFleet
+from aiotsmart.exceptions import TSmartError, TSmartTimeoutError
+from aiotsmart.models import Configuration, Mode, Status
+from aiotsmart.simulator import HeaterSimulator, SimulatedHeater
+
+
+async def test_simulated_heater_requests() -> None:
+    """Test a client reads and writes a simulated heater."""
+    async with HeaterSimulator.create(3) as simulator:
+        heater = simulator.heaters[1]
+        assert heater.port
+
+        async with TSmartClient(
+            heater.ip_address, local_port=0, port=heater.port
+        ) as client:
+            configuration = await client.configuration_read()
+            assert configuration.device_id == "100001"
+            assert configuration.device_name == "SIM_0001"
+            assert configuration.firmware_version == "1.9.96"
+
+            status = await client.control_read()
+            assert status.power
+            assert status.temperature_average == 53
+
+            await client.control_write(False, Mode.ECO, 45)
+            assert heater.power is False
+            assert heater.mode == Mode.ECO
+            assert heater.setpoint == 45
+
+            heater.errors.add("error_e02")
+            status = await client.control_read()
+            assert not status.power
+            assert status.setpoint == 45
+            assert status.error_e02
+
+    assert heater.requests == 4
+    assert simulator.heaters[0].requests == 0
+
+
+async def test_simulated_heater_silent() -> None:
+    """Test a silent heater times out."""
+    async with HeaterSimulator([SimulatedHeater(silent=True)]) as simulator:
+        heater = simulator.heaters[0]
+        client = TSmartClient(
+            heater.ip_address, local_port=0, port=heater.port, timeout=0.2
+        )
+        with pytest.raises(TSmartTimeoutError):
+            await client.control_read()
+
+
+async def test_simulated_heater_hostname() -> None:
+    """Test a client resolves a hostname to match the heater's replies."""
+    async with HeaterSimulator.create(1) as simulator:
+        heater = simulator.heaters[0]
+        async with TSmartClient(
+            "localhost", local_port=0, port=heater.port, timeout=0.5
+        ) as client:
+            status = await client.control_read()
+            assert status.power
+            await client.control_write(False, Mode.ECO, 45)
+
+    assert heater.requests == 2
+
+
+async def test_client_unresolved_hostname() -> None:
+    """Test a hostname that does not resolve fails the request."""
+    client = TSmartClient("heater.invalid", local_port=0, timeout=0.5)
+    with pytest.raises(TSmartError, match="Cannot resolve heater.invalid"):
+        await client.control_read()
+
+
+def test_simulated_heater_bad_requests() -> None:
+    """Test a heater ignores requests it does not understand."""
+    heater = SimulatedHeater()
+    assert heater.respond(b"\xf1\x00\x00\x00") is None
+    assert heater.respond(b"\x05\x00\x00\x50") is None
+    assert heater.respond(b"\xf2\x00\x00\x01\x00\x00\x07\xa1") is None
+    assert heater.requests == 0
+
+
+async def test_simulated_fleet() -> None:
+    """Test a fleet reads a thousand heaters on loopback addresses."""
+    async with HeaterSimulator.create(1000, host="127.0.1.1", port=1337) as simulator:
+        fleet = TSmartFleet(simulator.devices, local_port=0, timeout=2)
+        configurations = await fleet.configuration_read()
+        statuses = await fleet.control_read()
+
+    assert len(configurations) == 1000
+    assert all(isinstance(result, Configuration) for result in configurations.values())
+    assert all(isinstance(result, Status) for result in statuses.values())
+    assert configurations["1003E7"].device_name == "SIM_0999"  # type: ignore[union-attr]
+
+
+async def test_simulated_discovery() -> None:
+    """Test discovery finds simulated heaters by broadcast."""
+    simulator = HeaterSimulator.create(3, host="127.0.2.1", port=1337, broadcast=True)
+    try:
+        await simulator.start()
+    except OSError:
+        pytest.skip("Broadcast is not available")
+
+    try:
+        with patch("aiotsmart.discovery.DISCOVERY_INTERVAL", 0.1):
+            devices = await TSmartDiscovery().discover()
+    finally:
+        simulator.close()
+
+    for device in simulator.devices:
+        assert device in devices
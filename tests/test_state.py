@@ -0,0 +1,159 @@
+"""Test TSmart shared device state."""
+
+from dataclasses import replace
+from unittest.mock import Mock, patch
+
+from aiotsmart.codec import decode_control_read, pack_control_read_response
+from aiotsmart.models import (
+    CompactStatus,
+    Configuration,
+    DiscoveredDevice,
+    Mode,
+    Status,
+)
+from aiotsmart.state import device_discovered, get_device_state
+from aiotsmart.util import validate_checksum
+
+ADDR = ("192.168.1.1", 1337)
+CONFIGURATION = Configuration(
+    device_id="9B2A0D",
+    device_name="TESLA",
+    firmware_version="1.9.96",
+    firmware_name="Boiler",
+    raw_response=b"",
+)
+
+
+def test_device_state_shared() -> None:
+    """Test the state for an address is shared."""
+    assert get_device_state(ADDR) is get_device_state(ADDR)
+    assert get_device_state(ADDR) is not get_device_state(("192.168.1.2", 1337))
+
+
+def test_configuration_ttl() -> None:
+    """Test the cached configuration expires."""
+    state = get_device_state(ADDR)
+    assert state.cached_configuration(60) is None
+
+    with patch("aiotsmart.state.time.monotonic", return_value=100):
+        state.set_configuration(CONFIGURATION)
+    with patch("aiotsmart.state.time.monotonic", return_value=159):
+        assert state.cached_configuration(60) is CONFIGURATION
+    with patch("aiotsmart.state.time.monotonic", return_value=160):
+        assert state.cached_configuration(60) is None
+
+    state.invalidate_configuration()
+    assert state.configuration is None
+
+
+def test_device_discovered() -> None:
+    """Test a rediscovered heater with changed details drops its configuration."""
+    state = get_device_state(ADDR)
+    state.set_configuration(CONFIGURATION)
+
+    device_discovered(DiscoveredDevice(ADDR[0], "9B2A0D", "TESLA"))
+    assert state.configuration is CONFIGURATION
+
+    device_discovered(DiscoveredDevice(ADDR[0], "9B2A0D", "Renamed"))
+    assert state.configuration is None
+
+    # Unknown heaters are ignored
+    device_discovered(DiscoveredDevice("192.168.1.9", "000001", "Other"))
+
+
+def test_status_max_age() -> None:
+    """Test the cached status is only returned while fresh enough."""
+    state = get_device_state(ADDR)
+    status = Mock()
+
+    assert state.cached_status(10) is None
+
+    with patch("aiotsmart.state.time.monotonic", return_value=100):
+        state.set_status(status)
+    with patch("aiotsmart.state.time.monotonic", return_value=105):
+        assert state.cached_status(10) is status
+        assert state.cached_status(5) is None
+
+    state.invalidate_status()
+    assert state.cached_status(10) is None
+
+    assert state.status_hits == 1
+    assert state.status_misses == 3
+
+
+def test_apply_write() -> None:
+    """Test an acknowledged write is applied to the cached status."""
+    state = get_device_state(ADDR)
+
+    state.apply_write(True, Mode.ECO, 50)
+    assert state.status is None
+
+    status = Status(
+        power=False,
+        setpoint=10,
+        mode=Mode.MANUAL,
+        temperature_high=54,
+        temperature_low=53,
+        temperature_average=53,
+        relay=False,
+        error_e01=False,
+        error_e02=False,
+        error_e03=False,
+        error_e04=False,
+        error_e05=False,
+        error_w01=False,
+        error_w02=False,
+        error_w03=False,
+        raw_response=b"",
+    )
+    state.set_status(status)
+    state.apply_write(True, Mode.ECO, 50)
+
+    assert state.optimistic
+    assert state.status == replace(status, power=True, mode=Mode.ECO, setpoint=50)
+
+    state.set_status(status)
+    assert not state.optimistic
+
+
+def test_apply_write_patches_raw_response() -> None:
+    """Test an optimistic status carries a frame matching its fields."""
+    frame = pack_control_read_response(
+        False,
+        setpoint=10,
+        mode=Mode.MANUAL,
+        temperature_high=54,
+        temperature_low=53,
+        relay=False,
+    )
+    fields = decode_control_read(frame)
+    status = Status(
+        power=fields.power,
+        setpoint=fields.setpoint,
+        mode=Mode(fields.mode),
+        temperature_high=fields.temperature_high,
+        temperature_low=fields.temperature_low,
+        temperature_average=fields.temperature_average,
+        relay=fields.relay,
+        error_e01=fields.error_e01,
+        error_e02=fields.error_e02,
+        error_e03=fields.error_e03,
+        error_e04=fields.error_e04,
+        error_e05=fields.error_e05,
+        error_w01=fields.error_w01,
+        error_w02=fields.error_w02,
+        error_w03=fields.error_w03,
+        raw_response=frame,
+    )
+    state = get_device_state(ADDR)
+    state.set_status(status)
+    state.apply_write(True, Mode.ECO, 30)
+
+    assert state.status is not None
+    assert validate_checksum(state.status.raw_response)
+    compact = CompactStatus.from_status(state.status)
+    assert compact.power
+    assert compact.setpoint == 30
+    assert compact.mode == Mode.ECO
+    assert compact.temperature_high == 54
+    assert compact == state.status
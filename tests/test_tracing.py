@@ -0,0 +1,128 @@
+"""Test TSmart tracing hooks."""
+
+from __future__ import annotations
+
+import asyncio
+from functools import partial
+
+import pytest
+
+from aiotsmart.codec import COMMAND_CONTROL_READ, COMMAND_CONTROL_WRITE
+from aiotsmart.exceptions import TSmartCancelledError, TSmartTimeoutError
+from aiotsmart.models import Mode
+from aiotsmart.simulator import HeaterSimulator, SimulatedHeater
+from aiotsmart.tracing import TSmartTracer
+from aiotsmart.tsmart import TSmartClient
+
+HOOKS = (
+    "socket_created",
+    "datagram_sent",
+    "datagram_received",
+    "unpack_started",
+    "unpack_finished",
+    "request_resolved",
+    "request_timeout",
+    "request_cancelled",
+)
+
+
+class RecordingTracer(TSmartTracer):
+    """Tracer recording the hooks called."""
+
+    def __init__(self) -> None:
+        """Initialize with every hook recording its calls."""
+        self.events: list[tuple[str, float, tuple[str, int], int | None]] = []
+        for name in HOOKS:
+            setattr(self, name, partial(self._record, name))
+
+    def _record(
+        self,
+        name: str,
+        timestamp: float,
+        peer: tuple[str, int],
+        command: int | None,
+    ) -> None:
+        """Record a call to a hook."""
+        self.events.append((name, timestamp, peer, command))
+
+    @property
+    def names(self) -> list[str]:
+        """Return the names of the hooks called."""
+        return [event[0] for event in self.events]
+
+
+async def test_trace_request() -> None:
+    """Test a request calls every hook in order."""
+    tracer = RecordingTracer()
+    async with HeaterSimulator([SimulatedHeater()]) as simulator:
+        heater = simulator.heaters[0]
+        client = TSmartClient(
+            heater.ip_address, local_port=0, port=heater.port, tracer=tracer
+        )
+        await client.control_read()
+
+    assert tracer.names == [
+        "socket_created",
+        "datagram_sent",
+        "datagram_received",
+        "unpack_started",
+        "unpack_finished",
+        "request_resolved",
+    ]
+    peer = (heater.ip_address, heater.port)
+    assert {event[2] for event in tracer.events} == {peer}
+    assert {event[3] for event in tracer.events} == {COMMAND_CONTROL_READ}
+    timestamps = [event[1] for event in tracer.events]
+    assert timestamps == sorted(timestamps)
+
+
+async def test_trace_socket_opened_by_async_with() -> None:
+    """Test a socket opened by async with is traced without a command."""
+    tracer = RecordingTracer()
+    async with TSmartClient("127.0.0.1", local_port=0, tracer=tracer):
+        pass
+
+    assert tracer.events[0][0] == "socket_created"
+    assert tracer.events[0][3] is None
+
+
+async def test_trace_timeout() -> None:
+    """Test a lost request traces each send and the timeout."""
+    tracer = RecordingTracer()
+    async with HeaterSimulator([SimulatedHeater(silent=True)]) as simulator:
+        heater = simulator.heaters[0]
+        async with TSmartClient(
+            heater.ip_address,
+            local_port=0,
+            port=heater.port,
+            timeout=0.8,
+            retries=1,
+            tracer=tracer,
+        ) as client:
+            with pytest.raises(TSmartTimeoutError):
+                await client.control_read()
+
+    assert tracer.names == [
+        "socket_created",
+        "datagram_sent",
+        "datagram_sent",
+        "request_timeout",
+    ]
+
+
+async def test_trace_cancelled() -> None:
+    """Test a request cancelled while waiting is traced."""
+    tracer = RecordingTracer()
+    async with HeaterSimulator([SimulatedHeater(silent=True)]) as simulator:
+        heater = simulator.heaters[0]
+        async with TSmartClient(
+            heater.ip_address, local_port=0, port=heater.port, tracer=tracer
+        ) as client:
+            task = asyncio.create_task(client.control_write(True, Mode.MANUAL, 50))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(TSmartCancelledError):
+                await task
+
+    assert tracer.names[-1] == "request_cancelled"
+    assert tracer.events[-1][3] == COMMAND_CONTROL_WRITE
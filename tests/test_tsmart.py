@@ -2,19 +2,31 @@
 
 from __future__ import annotations
 
+import asyncio
+import struct
 from typing import TYPE_CHECKING
+from unittest.mock import Mock, patch
+
 import pytest
 
 import aiotsmart
-
-from aiotsmart.exceptions import TSmartBadResponseError
+from aiotsmart.exceptions import (
+    TSmartBadResponseError,
+    TSmartCancelledError,
+    TSmartTimeoutError,
+)
+from aiotsmart.history import HistoryStore
+from aiotsmart.metrics import TSmartMetrics
 from aiotsmart.models import Mode, Status
 import aiotsmart.tsmart
+from aiotsmart.tsmart import TSmartClient
 from aiotsmart.util import add_checksum
 
 if TYPE_CHECKING:
     from syrupy import SnapshotAssertion
 
+ADDR = ("192.168.1.1", 1337)
+
 CONFIGURATION_REQUEST = bytearray(b"!\x00\x00t")
 CONFIGURATION_DATA = bytearray(
     b"!\x00\x00 \x00\r*\x9b\x00TESLA\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00d\x00\x01\t`Boiler\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x03\x00\xff\xff\x01\x01\x00\x00\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\x00\x00\xff\xff\xff\xff\x00\x00abcdefghijklmnopq\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00abcdefghijkl\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xd0!\xf9\xb1\xd6QTESLA_9B2A0D\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x0c\x01\xa7\x1e\x00\x00\x00\x00\x00\x04d\x00\t\x00\x00\x00\x01\x00\x00\x00t"
@@ -226,11 +238,594 @@ async def test_tsmart_protocol_datagram_received() -> None:
     def mock_unpack(_request: bytearray, _data: bytes) -> dict[str, str]:  # pylint: disable=unused-argument
         return {"test": "response"}
 
-    protocol = aiotsmart.tsmart.TsmartProtocol(bytearray(b"test"), mock_unpack)
+    protocol = aiotsmart.tsmart.TsmartProtocol()
+    protocol.connection_made(Mock())
+    future = protocol.send(ADDR, CONTROL_READ_REQUEST, mock_unpack)
 
     # Simulate receiving data
-    protocol.datagram_received(b"test_data", ("192.168.1.1", 1337))
+    protocol.datagram_received(CONTROL_READ_DATA, ADDR)
 
     # Check that the future is set
-    assert protocol.done.done()
-    assert protocol.done.result() == {"test": "response"}
+    assert future.done()
+    assert future.result() == {"test": "response"}
+
+
+async def test_tsmart_protocol_dispatch() -> None:
+    """Test responses are matched on source address and command."""
+    protocol = aiotsmart.tsmart.TsmartProtocol()
+    transport = Mock()
+    protocol.connection_made(transport)
+
+    other_addr = ("192.168.1.2", 1337)
+    # pylint:disable=protected-access
+    read = protocol.send(
+        ADDR, CONTROL_READ_REQUEST, aiotsmart.tsmart._unpack_control_read_response
+    )
+    configuration = protocol.send(
+        other_addr,
+        CONFIGURATION_REQUEST,
+        aiotsmart.tsmart._unpack_configuration_response,
+    )
+    transport.sendto.assert_any_call(CONTROL_READ_REQUEST, ADDR)
+    transport.sendto.assert_any_call(CONFIGURATION_REQUEST, other_addr)
+
+    # Right command from the wrong device is ignored
+    protocol.datagram_received(CONTROL_READ_DATA, other_addr)
+    assert not read.done()
+
+    protocol.datagram_received(CONFIGURATION_DATA, other_addr)
+    protocol.datagram_received(CONTROL_READ_DATA, ADDR)
+
+    assert read.result().setpoint == 10
+    assert configuration.result().device_name == "TESLA"
+
+
+async def test_tsmart_protocol_bad_response() -> None:
+    """Test a bad response fails the waiting request."""
+    protocol = aiotsmart.tsmart.TsmartProtocol()
+    protocol.connection_made(Mock())
+
+    # pylint:disable=protected-access
+    future = protocol.send(
+        ADDR, CONTROL_READ_REQUEST, aiotsmart.tsmart._unpack_control_read_response
+    )
+    protocol.datagram_received(BAD_CONTROL_READ_DATA, ADDR)
+
+    with pytest.raises(TSmartBadResponseError):
+        future.result()
+
+
+async def test_tsmart_protocol_overlapping_requests() -> None:
+    """Test overlapping requests to one peer are answered in order."""
+    protocol = aiotsmart.tsmart.TsmartProtocol()
+    protocol.connection_made(Mock())
+
+    # pylint:disable=protected-access
+    first = protocol.send(
+        ADDR, CONTROL_READ_REQUEST, aiotsmart.tsmart._unpack_control_read_response
+    )
+    write = protocol.send(
+        ADDR,
+        bytearray(b"\xf2\x00\x00"),
+        aiotsmart.tsmart._unpack_control_write_response,
+    )
+    second = protocol.send(
+        ADDR, CONTROL_READ_REQUEST, aiotsmart.tsmart._unpack_control_read_response
+    )
+
+    protocol.datagram_received(CONTROL_READ_DATA, ADDR)
+    assert first.done()
+    assert not second.done()
+
+    protocol.datagram_received(CONTROL_WRITE_DATA, ADDR)
+    protocol.datagram_received(CONTROL_READ_DATA, ADDR)
+    assert write.result() is None
+    assert second.result() == first.result()
+
+
+async def test_tsmart_protocol_error_response() -> None:
+    """Test an error response fails the oldest request to that peer."""
+    protocol = aiotsmart.tsmart.TsmartProtocol()
+    protocol.connection_made(Mock())
+
+    # pylint:disable=protected-access
+    configuration = protocol.send(
+        ADDR,
+        CONFIGURATION_REQUEST,
+        aiotsmart.tsmart._unpack_configuration_response,
+    )
+    read = protocol.send(
+        ADDR, CONTROL_READ_REQUEST, aiotsmart.tsmart._unpack_control_read_response
+    )
+
+    protocol.datagram_received(b"\x00\x00\x00\x55", ADDR)
+    with pytest.raises(TSmartBadResponseError):
+        configuration.result()
+    assert not read.done()
+
+    protocol.discard(ADDR, CONTROL_READ_REQUEST[0], read)
+    protocol.datagram_received(CONTROL_READ_DATA, ADDR)
+    assert not read.done()
+
+
+async def test_shared_endpoint() -> None:
+    """Test clients share one endpoint which closes with the last client."""
+    async with TSmartClient("192.168.1.1") as first:
+        async with TSmartClient("192.168.1.2") as second:
+            # pylint:disable=protected-access
+            assert first._endpoint is second._endpoint
+            endpoint = first._endpoint
+            assert endpoint
+            assert endpoint.users == 2
+
+        assert not endpoint.transport.is_closing()
+
+    assert endpoint.transport.is_closing()
+
+
+async def test_client_requests() -> None:
+    """Test client requests over the shared endpoint."""
+    async with TSmartClient(ADDR[0]) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+        responses = {
+            0x21: CONFIGURATION_DATA,
+            0xF1: CONTROL_READ_DATA,
+            0xF2: CONTROL_WRITE_DATA,
+        }
+
+        def sendto(request: bytes, addr: tuple[str, int]) -> None:
+            asyncio.get_running_loop().call_soon(
+                protocol.datagram_received, responses[request[0]], addr
+            )
+
+        with patch.object(protocol, "transport", Mock(sendto=sendto)):
+            configuration = await client.configuration_read()
+            status = await client.control_read()
+            await client.control_write(True, Mode.MANUAL, 50)
+
+    assert configuration.device_id == "9B2A0D"
+    assert status.temperature_high == 54
+
+
+async def test_ephemeral_endpoint() -> None:
+    """Test clients on an ephemeral port get their own shared endpoint."""
+    async with (
+        TSmartClient("192.168.1.1") as fixed,
+        TSmartClient("192.168.1.1", local_port=0) as first,
+        TSmartClient("192.168.1.2", local_port=0) as second,
+    ):
+        # pylint:disable=protected-access
+        assert first._endpoint is second._endpoint
+        assert first._endpoint is not fixed._endpoint
+        assert first._endpoint
+        assert first._endpoint.transport.get_extra_info("sockname")[1] != 1337
+
+
+async def test_client_concurrent_requests() -> None:
+    """Test concurrent requests from one client are matched correctly."""
+    async with TSmartClient(ADDR[0]) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+        responses = {0xF1: CONTROL_READ_DATA, 0xF2: CONTROL_WRITE_DATA}
+
+        def sendto(request: bytes, addr: tuple[str, int]) -> None:
+            asyncio.get_running_loop().call_later(
+                0.01 if request[0] == 0xF1 else 0,
+                protocol.datagram_received,
+                responses[request[0]],
+                addr,
+            )
+
+        with patch.object(protocol, "transport", Mock(sendto=sendto)):
+            first, _, second = await asyncio.gather(
+                client.control_read(),
+                client.control_write(False, Mode.ECO, 40),
+                client.control_read(),
+            )
+
+    assert first == second
+
+
+async def test_client_single_flight_reads() -> None:
+    """Test concurrent reads of one heater share a single request."""
+    async with (
+        TSmartClient(ADDR[0]) as first,
+        TSmartClient(ADDR[0]) as second,
+    ):
+        # pylint:disable=protected-access
+        assert first._endpoint
+        protocol = first._endpoint.protocol
+        transport = Mock()
+
+        with patch.object(protocol, "transport", transport):
+            reads = [
+                asyncio.create_task(client.control_read())
+                for client in (first, second, first)
+            ]
+            cancelled = asyncio.create_task(second.control_read())
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+            protocol.datagram_received(CONTROL_READ_DATA, ADDR)
+            statuses = await asyncio.gather(*reads)
+
+        assert transport.sendto.call_count == 1
+        assert statuses[0] is statuses[1] is statuses[2]
+        with pytest.raises(TSmartCancelledError):
+            await cancelled
+        assert not protocol.in_flight
+
+
+async def test_client_configuration_cache() -> None:
+    """Test configuration reads are served from the cache while fresh."""
+    async with (
+        TSmartClient(ADDR[0], configuration_ttl=60, timeout=0.05, retries=0) as client,
+        TSmartClient(ADDR[0]) as uncached,
+    ):
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+        transport = Mock()
+
+        def sendto(request: bytes, addr: tuple[str, int]) -> None:
+            transport(request)
+            if request[0] == 0x21:
+                asyncio.get_running_loop().call_soon(
+                    protocol.datagram_received, CONFIGURATION_DATA, addr
+                )
+
+        with patch.object(protocol, "transport", Mock(sendto=sendto)):
+            first = await client.configuration_read()
+            assert await client.configuration_read() is first
+            assert transport.call_count == 1
+
+            # Clients without a TTL always go to the heater
+            await uncached.configuration_read()
+            assert transport.call_count == 2
+
+            client.invalidate_configuration()
+            await client.configuration_read()
+            assert transport.call_count == 3
+
+            # A heater that stops answering may be rebooting
+            with pytest.raises(TSmartTimeoutError):
+                await client.control_read()
+            await client.configuration_read()
+            assert transport.call_count == 5
+
+
+async def test_client_status_cache() -> None:
+    """Test control reads with max_age share a cached status across clients."""
+    async with (
+        TSmartClient(ADDR[0]) as first,
+        TSmartClient(ADDR[0]) as second,
+    ):
+        # pylint:disable=protected-access
+        assert first._endpoint
+        protocol = first._endpoint.protocol
+        transport = Mock()
+        responses = {0xF1: CONTROL_READ_DATA, 0xF2: CONTROL_WRITE_DATA}
+
+        def sendto(request: bytes, addr: tuple[str, int]) -> None:
+            transport(request)
+            asyncio.get_running_loop().call_soon(
+                protocol.datagram_received, responses[request[0]], addr
+            )
+
+        with patch.object(protocol, "transport", Mock(sendto=sendto)):
+            status = await first.control_read(max_age=10)
+            assert await second.control_read(max_age=10) is status
+            assert transport.call_count == 1
+
+            # Without max_age the heater is always read
+            assert await second.control_read() is not status
+            assert transport.call_count == 2
+
+            # An acknowledged write updates the cached status in place
+            await first.control_write(True, Mode.ECO, 50)
+            written = await second.control_read(max_age=10)
+            assert transport.call_count == 3
+            assert written.power
+            assert written.mode == Mode.ECO
+            assert written.setpoint == 50
+            assert first.status is written
+            assert first.state.optimistic
+
+            # The next read from the heater reconciles it
+            assert await second.control_read() == status
+            assert not first.state.optimistic
+
+        assert first.state.status_hits == 2
+        assert first.state.status_misses == 1
+
+
+async def test_client_coalesced_writes() -> None:
+    """Test rapid writes are collapsed into a write of the newest values."""
+    async with TSmartClient(ADDR[0], coalesce_writes=True) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+        sent: list[bytes] = []
+
+        def sendto(request: bytes, addr: tuple[str, int]) -> None:
+            sent.append(bytes(request))
+            asyncio.get_running_loop().call_later(
+                0.01, protocol.datagram_received, CONTROL_WRITE_DATA, addr
+            )
+
+        with patch.object(protocol, "transport", Mock(sendto=sendto)):
+            writes = []
+            for setpoint in range(40, 45):
+                writes.append(
+                    asyncio.create_task(
+                        client.control_write(True, Mode.MANUAL, setpoint)
+                    )
+                )
+                await asyncio.sleep(0)
+            await asyncio.gather(*writes)
+
+    assert [request[4] for request in sent] == [400 % 256, 440 % 256]
+
+
+async def test_client_coalesced_write_failure() -> None:
+    """Test collapsed writes all get the failure of the write sent."""
+    async with TSmartClient(
+        ADDR[0], coalesce_writes=True, write_debounce=0.01, timeout=0.05, retries=0
+    ) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        transport = Mock()
+
+        with patch.object(client._endpoint.protocol, "transport", transport):
+            results = await asyncio.gather(
+                client.control_write(True, Mode.MANUAL, 40),
+                client.control_write(False, Mode.ECO, 45),
+                return_exceptions=True,
+            )
+
+    assert transport.sendto.call_count == 1
+    assert all(isinstance(result, TSmartTimeoutError) for result in results)
+
+
+async def test_client_coalesced_write_unexpected_error() -> None:
+    """Test collapsed writes get errors other than TSmartError."""
+    async with TSmartClient(ADDR[0], coalesce_writes=True) as client:
+        with pytest.raises(struct.error):
+            await asyncio.wait_for(client.control_write(True, Mode.MANUAL, 7000), 1)
+
+        assert client.state.pending_write_done is None
+
+
+async def test_client_coalesced_write_cancelled() -> None:
+    """Test collapsed writes fail when the drain task is cancelled."""
+    async with TSmartClient(ADDR[0], coalesce_writes=True, write_debounce=10) as client:
+        write = asyncio.create_task(client.control_write(True, Mode.MANUAL, 40))
+        await asyncio.sleep(0)
+        task = client.state.write_task
+        assert task is not None
+        task.cancel()
+
+        with pytest.raises(TSmartCancelledError):
+            await asyncio.wait_for(write, 1)
+
+        assert client.state.pending_write is None
+        assert client.state.pending_write_done is None
+
+
+async def test_client_watch() -> None:
+    """Test watching yields changed statuses from a single poll loop."""
+    changed = add_checksum(CONTROL_READ_DATA[:3] + b"\x01" + CONTROL_READ_DATA[4:])
+    frames = [CONTROL_READ_DATA, CONTROL_READ_DATA, changed]
+
+    async with TSmartClient(ADDR[0]) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+        transport = Mock()
+
+        def sendto(request: bytes, addr: tuple[str, int]) -> None:
+            transport(request)
+            frame = frames.pop(0) if len(frames) > 1 else frames[0]
+            asyncio.get_running_loop().call_soon(
+                protocol.datagram_received, frame, addr
+            )
+
+        with patch.object(protocol, "transport", Mock(sendto=sendto)):
+            first = client.watch(interval=0.01)
+            second = client.watch(interval=0.02)
+
+            initial = await anext(first)
+            assert not initial.power
+            assert await anext(second) is initial
+
+            assert (await anext(first)).power
+            assert (await anext(second)).power
+            assert transport.call_count == 3
+
+            poller = client.state.poller
+            assert poller
+            assert poller.interval == 0.01
+
+            await first.aclose()
+            assert not poller.task.done()
+            await second.aclose()
+            await asyncio.sleep(0)
+
+        assert poller.task.cancelled()
+        assert client.state.poller is None
+
+
+async def test_client_watch_failed() -> None:
+    """Test a poll loop failure is raised from every watch."""
+    client = TSmartClient(ADDR[0])
+    with patch.object(TSmartClient, "__aenter__", side_effect=OSError("no socket")):
+        first = client.watch(interval=0.01)
+        second = client.watch(interval=0.01)
+        first_read = asyncio.ensure_future(anext(first))
+        second_read = asyncio.ensure_future(anext(second))
+
+        with pytest.raises(OSError, match="no socket"):
+            await asyncio.wait_for(first_read, 1)
+        with pytest.raises(OSError, match="no socket"):
+            await asyncio.wait_for(second_read, 1)
+
+    assert client.state.poller is None
+
+
+async def test_client_history() -> None:
+    """Test status reads are recorded once in the history store."""
+    history = HistoryStore(10)
+    async with (
+        TSmartClient(ADDR[0], history=history) as first,
+        TSmartClient(ADDR[0], history=history) as second,
+    ):
+        # pylint:disable=protected-access
+        assert first._endpoint
+        protocol = first._endpoint.protocol
+
+        def sendto(_request: bytes, addr: tuple[str, int]) -> None:
+            asyncio.get_running_loop().call_soon(
+                protocol.datagram_received, CONTROL_READ_DATA, addr
+            )
+
+        with patch.object(protocol, "transport", Mock(sendto=sendto)):
+            await asyncio.gather(first.control_read(), second.control_read())
+            await first.control_read(max_age=10)
+            await first.control_read()
+
+    assert history[ADDR[0]].window()["temperature_high"].tolist() == [54, 54]
+
+
+async def test_client_timeout() -> None:
+    """Test a request without a response times out."""
+    async with TSmartClient(ADDR[0], timeout=0.01) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+
+        with (
+            patch.object(protocol, "transport", Mock()),
+            pytest.raises(TSmartTimeoutError),
+        ):
+            await client.control_read()
+
+
+async def test_client_retransmit() -> None:
+    """Test a lost request is retransmitted on the adaptive timer."""
+    metrics = TSmartMetrics()
+    async with TSmartClient(ADDR[0], metrics=metrics) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+        protocol.estimator(ADDR).rto = 0.01
+        sent: list[bytes] = []
+
+        def sendto(request: bytes, addr: tuple[str, int]) -> None:
+            sent.append(request)
+            if len(sent) == 3:
+                asyncio.get_running_loop().call_soon(
+                    protocol.datagram_received, CONTROL_READ_DATA, addr
+                )
+
+        with patch.object(protocol, "transport", Mock(sendto=sendto)):
+            status = await client.control_read()
+
+    assert status.setpoint == 10
+    assert metrics.device(ADDR[0]).attempts == {3: 1}
+    assert sent == [CONTROL_READ_REQUEST] * 3
+
+
+async def test_client_retransmit_late_replies() -> None:
+    """Test the late replies to a retransmitted write do not ack the next."""
+    async with TSmartClient(ADDR[0], timeout=0.3, retries=1) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+        protocol.estimator(ADDR).rto = 0.05
+        loop = asyncio.get_running_loop()
+        sent: list[bytes] = []
+        ack = bytes(CONTROL_WRITE_DATA)
+
+        def sendto(request: bytes, addr: tuple[str, int]) -> None:
+            sent.append(request)
+            # The first write is acked slowly, once per send; then it goes dead
+            if len(sent) <= 2:
+                loop.call_later(0.06, protocol.datagram_received, ack, addr)
+
+        with patch.object(protocol, "transport", Mock(sendto=sendto)):
+            await client.control_write(True, Mode.MANUAL, 40)
+            assert len(sent) == 2
+            with pytest.raises(TSmartTimeoutError):
+                await client.control_write(True, Mode.MANUAL, 50)
+
+
+async def test_protocol_late_replies_expire() -> None:
+    """Test replies owed to a finished request stop being dropped in time."""
+    protocol = aiotsmart.tsmart.TsmartProtocol()
+    protocol.connection_made(Mock())
+    protocol.estimator(ADDR).rto = 0.01
+    # pylint:disable=protected-access
+    unpack = aiotsmart.tsmart._unpack_control_read_response
+    request = bytes(CONTROL_READ_REQUEST)
+    response = bytes(CONTROL_READ_DATA)
+
+    first = protocol.send(ADDR, request, unpack)
+    protocol.retransmit(ADDR, request[0], first)
+    protocol.retransmit(ADDR, request[0], first)
+    protocol.datagram_received(response, ADDR)
+    assert first.done()
+
+    # A reply owed to a retransmission is not taken by a newer read
+    second = protocol.send(ADDR, request, unpack)
+    protocol.datagram_received(response, ADDR)
+    assert not second.done()
+
+    # Once a retransmission timeout late, replies are matched again
+    await asyncio.sleep(0.02)
+    protocol.datagram_received(response, ADDR)
+    assert second.done()
+
+
+async def test_client_retries_exhausted() -> None:
+    """Test retransmission stops after the configured retries."""
+    metrics = TSmartMetrics()
+    async with TSmartClient(ADDR[0], timeout=0.2, retries=1, metrics=metrics) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+        protocol.estimator(ADDR).rto = 0.01
+        transport = Mock()
+
+        with (
+            patch.object(protocol, "transport", transport),
+            pytest.raises(TSmartTimeoutError),
+        ):
+            await client.control_read()
+
+    assert transport.sendto.call_count == 2
+    assert metrics.device(ADDR[0]).attempts == {2: 1}
+
+
+async def test_client_write_not_retransmitted_behind_newer_write() -> None:
+    """Test a write is not retransmitted once a newer write is pending."""
+    async with TSmartClient(ADDR[0], timeout=0.1) as client:
+        # pylint:disable=protected-access
+        assert client._endpoint
+        protocol = client._endpoint.protocol
+        protocol.estimator(ADDR).rto = 0.01
+        transport = Mock()
+
+        with patch.object(protocol, "transport", transport):
+            results = await asyncio.gather(
+                client.control_write(True, Mode.MANUAL, 40),
+                client.control_write(True, Mode.MANUAL, 50),
+                return_exceptions=True,
+            )
+
+    assert all(isinstance(result, TSmartTimeoutError) for result in results)
+    writes = [call.args[0][4] for call in transport.sendto.call_args_list]
+    # The older write (40 degrees) is only ever sent once
+    assert writes.count(400 % 256) == 1
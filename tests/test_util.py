@@ -1,6 +1,39 @@
 """Test utility functions."""
 
-from aiotsmart.util import validate_checksum, add_checksum
+import random
+
+import pytest
+
+from aiotsmart.util import (
+    RTO_INITIAL,
+    RTO_MAX,
+    RTO_MIN,
+    RttEstimator,
+    add_checksum,
+    add_checksum_into,
+    validate_checksum,
+    validate_checksums,
+)
+
+
+def _loop_checksum(data: bytes) -> int:
+    """Return the checksum byte as the original byte by byte loop did."""
+    t = 0
+    for b in data[:-1]:
+        t = t ^ b
+    return t ^ 0x55
+
+
+def _random_frames(count: int, size: int | None = None) -> list[bytes]:
+    """Return random frames, about half with a valid checksum."""
+    rng = random.Random(size)
+    frames = []
+    for _ in range(count):
+        frame = bytearray(rng.randbytes(size or rng.randint(1, 400)))
+        if rng.random() < 0.5:
+            frame[-1] = _loop_checksum(frame)
+        frames.append(bytes(frame))
+    return frames
 
 
 def test_validate_checksum_valid() -> None:
@@ -52,3 +85,90 @@ def test_checksum_roundtrip() -> None:
 
     # Validate the checksum
     assert validate_checksum(data_with_checksum) is True
+
+
+def test_rtt_estimator() -> None:
+    """Test the round trip time estimator."""
+    estimator = RttEstimator()
+    assert estimator.rto == RTO_INITIAL
+
+    estimator.update(0.01)
+    assert estimator.srtt == 0.01
+    assert estimator.rto == RTO_MIN
+
+    for _ in range(10):
+        estimator.update(0.1)
+    assert estimator.srtt is not None
+    assert 0.01 < estimator.srtt < 0.1
+    assert RTO_MIN < estimator.rto < RTO_MAX
+
+    for _ in range(10):
+        estimator.backoff()
+    assert estimator.rto == RTO_MAX
+
+
+def test_checksum_matches_loop() -> None:
+    """Test the checksums are bit for bit those of the byte by byte loop."""
+    for frame in _random_frames(2000):
+        expected = _loop_checksum(frame)
+        assert validate_checksum(frame) is (expected == frame[-1])
+        assert validate_checksum(memoryview(frame)) is (expected == frame[-1])
+        assert add_checksum(frame)[-1] == expected
+
+        buffer = bytearray(frame)
+        add_checksum_into(buffer)
+        assert buffer[:-1] == frame[:-1]
+        assert buffer[-1] == expected
+
+
+def test_add_checksum_into_memoryview() -> None:
+    """Test filling in the checksum of part of a larger buffer."""
+    buffer = bytearray(b"\xff\xf1\x00\x00\x00\xff")
+    add_checksum_into(memoryview(buffer)[1:5])
+    assert buffer == bytearray(b"\xff\xf1\x00\x00\xa4\xff")
+
+
+@pytest.mark.parametrize("use_numpy", [None, False])
+def test_validate_checksums_buffer(use_numpy: bool | None) -> None:
+    """Test validating a buffer of back to back frames."""
+    frames = _random_frames(200, 30)
+    expected = [_loop_checksum(frame) == frame[-1] for frame in frames]
+
+    assert validate_checksums(b"".join(frames), 30, use_numpy) == expected
+    assert validate_checksums(bytearray(b"".join(frames)), 30, use_numpy) == expected
+
+
+@pytest.mark.parametrize("use_numpy", [None, False])
+def test_validate_checksums_sequence(use_numpy: bool | None) -> None:
+    """Test validating a sequence of frames of one length."""
+    frames = _random_frames(200, 326)
+    expected = [_loop_checksum(frame) == frame[-1] for frame in frames]
+
+    assert validate_checksums(frames, use_numpy=use_numpy) == expected
+    assert validate_checksums(frames, 326, use_numpy) == expected
+
+
+@pytest.mark.parametrize("use_numpy", [None, False])
+def test_validate_checksums_mixed_lengths(use_numpy: bool | None) -> None:
+    """Test validating frames of different lengths."""
+    frames = _random_frames(200)
+    expected = [_loop_checksum(frame) == frame[-1] for frame in frames]
+    assert validate_checksums(frames, use_numpy=use_numpy) == expected
+
+    # With a size, frames of another length are invalid
+    good = bytes(add_checksum(bytes(30)))
+    assert validate_checksums([good, good[:-1], good + b"\x55", good], 30) == [
+        True,
+        False,
+        False,
+        True,
+    ]
+    assert validate_checksums([], use_numpy=use_numpy) == []
+
+
+def test_validate_checksums_buffer_length() -> None:
+    """Test a buffer must hold whole frames of a given size."""
+    with pytest.raises(ValueError, match="multiple of 30"):
+        validate_checksums(bytes(31), 30)
+    with pytest.raises(ValueError, match="multiple of None"):
+        validate_checksums(bytes(30))